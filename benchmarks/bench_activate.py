@@ -0,0 +1,48 @@
+"""
+Batch Activation Benchmark
+
+Compares flipping the active flag of many items one PUT at a time with a
+single PUT /inventory/activate of their keys and with a single filtered
+PUT /inventory/deactivate.
+
+Usage:
+    python -m benchmarks.bench_activate [items]
+"""
+import sys
+import time
+from benchmarks.common import client, seed
+from service.models import Inventory
+
+
+def main(count: int):
+    """Seeds count items and times the three ways of switching them"""
+    seed(count)
+    test_client = client()
+    keys = [
+        {"pid": row.pid, "condition": row.condition.value}
+        for row in Inventory.read_rows(Inventory.select_rows())
+    ]
+    single = keys[: min(count, 1000)]
+
+    start = time.perf_counter()
+    for key in single:
+        test_client.put(f"/inventory/activate/{key['pid']}/{key['condition']}")
+    per_item = (time.perf_counter() - start) / len(single)
+    print(f"single PUTs       {per_item * 1000:8.3f} ms per item"
+          f"  ~{per_item * count:8.2f}s for {count} items")
+
+    start = time.perf_counter()
+    response = test_client.put("/inventory/activate", json=keys)
+    elapsed = time.perf_counter() - start
+    print(f"PUT keys          {elapsed:8.3f}s for {count} items"
+          f"  ({response.get_json()['updated']} changed)")
+
+    start = time.perf_counter()
+    response = test_client.put("/inventory/deactivate", query_string="min_quantity=0")
+    elapsed = time.perf_counter() - start
+    print(f"PUT filter        {elapsed:8.3f}s for {count} items"
+          f"  ({response.get_json()['updated']} changed)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,128 @@
+"""
+ASGI Concurrency Benchmark
+
+Compares the throughput of GET /inventory/<pid> when served by a fixed
+number of sync workers (the Flask app, as under gunicorn sync workers)
+and by the single process ASGI app, for a growing number of concurrent
+clients. Every SQL statement is delayed by a fixed latency to stand in for
+the round trip to a remote Postgres: the sync workers sleep through it,
+the async driver awaits it, so the ASGI app keeps serving other requests.
+
+Usage:
+    python -m benchmarks.bench_asgi [latency_ms] [workers]
+"""
+import asyncio
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event
+from sqlalchemy.util import await_only
+from benchmarks.common import app, client, seed
+from service.models import db
+from service.asgi import app as asgi_app
+
+ROWS = 10000
+REQUESTS_PER_CLIENT = 20
+CONCURRENCY = (1, 2, 4, 8, 16, 32, 64)
+
+
+def report(label, clients, elapsed, latencies):
+    """Prints the throughput and median latency of a run"""
+    print(
+        f"  {label:<5} {clients:>3} clients  {len(latencies) / elapsed:8.1f} req/s"
+        f"  p50 {statistics.median(latencies) * 1000:7.1f} ms"
+    )
+
+
+def run_wsgi(clients, workers):
+    """Runs the clients against a pool of sync workers"""
+    local = threading.local()
+    latencies = []
+
+    def handle(path):
+        if not hasattr(local, "client"):
+            local.client = client()
+        local.client.get(path)
+
+    def run_client(pool):
+        for _ in range(REQUESTS_PER_CLIENT):
+            start = time.perf_counter()
+            pool.submit(handle, f"/inventory/{random.randrange(ROWS)}").result()
+            latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(workers) as pool:
+        start = time.perf_counter()
+        threads = [threading.Thread(target=run_client, args=(pool,)) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    report("wsgi", clients, elapsed, latencies)
+
+
+async def get(path):
+    """Sends one GET request to the ASGI app"""
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await asgi_app(scope, receive, send)
+
+
+async def run_asgi(clients):
+    """Runs the clients against the ASGI app"""
+    latencies = []
+
+    async def run_client():
+        for _ in range(REQUESTS_PER_CLIENT):
+            start = time.perf_counter()
+            await get(f"/inventory/{random.randrange(ROWS)}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client() for _ in range(clients)))
+    report("asgi", clients, time.perf_counter() - start, latencies)
+
+
+def main(latency, workers):
+    """Compares both serving modes with a database latency in seconds"""
+    seed(ROWS)
+
+    @event.listens_for(db.engine, "before_cursor_execute")
+    def blocking_latency(*args):  # pylint: disable=unused-argument
+        time.sleep(latency)
+
+    @event.listens_for(asgi_app.engine.sync_engine, "before_cursor_execute")
+    def async_latency(*args):  # pylint: disable=unused-argument
+        await_only(asyncio.sleep(latency))
+
+    print(f"{latency * 1000:.0f} ms per statement, {workers} sync workers")
+    for clients in CONCURRENCY:
+        run_wsgi(clients, workers)
+        asyncio.run(run_asgi(clients))
+    with app.app_context():
+        db.session.remove()
+
+
+if __name__ == "__main__":
+    main(
+        float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.02,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2,
+    )
@@ -0,0 +1,44 @@
+"""
+Batch Create Benchmark
+
+Posts a catalog of items to POST /inventory:batch in chunks and reports the
+sustained insert rate in items per second.
+
+Usage:
+    python -m benchmarks.bench_batch [items] [chunk]
+"""
+import random
+import sys
+import time
+from benchmarks.common import client, seed
+
+
+def main(count: int, chunk: int):
+    """Creates count items through the batch endpoint"""
+    seed(0)
+    test_client = client()
+    payload = [
+        {
+            "pid": pid,
+            "condition": random.randint(0, 2),
+            "name": f"item-{pid}",
+            "quantity": random.randint(0, 100),
+            "restock_level": random.randint(1, 100),
+            "active": True,
+        }
+        for pid in range(count)
+    ]
+
+    start = time.perf_counter()
+    for offset in range(0, count, chunk):
+        response = test_client.post("/inventory:batch", json=payload[offset : offset + chunk])
+        assert response.status_code == 201, response.get_data(as_text=True)
+    elapsed = time.perf_counter() - start
+    print(f"{count} items in {elapsed:.2f}s: {count / elapsed:,.0f} items/sec")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 10000,
+    )
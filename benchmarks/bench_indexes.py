@@ -0,0 +1,96 @@
+"""
+Index Benchmark
+
+Times the Inventory filter queries on a table without secondary indexes and
+again after `create_indexes` has added them. On SQLite the query plans are
+printed as well, so the switch from full scans to index lookups is visible,
+and the run fails if an indexed query still scans the table.
+
+Usage:
+    python -m benchmarks.bench_indexes [rows ...]
+"""
+import sys
+from benchmarks.common import seed, timed
+from service.models import db, Inventory, Condition, create_indexes
+
+PAGE_SIZE = 100
+# the PID of the row whose name the name queries look for
+SAMPLE_PID = 4242
+# the name of the sample row, read after each seed
+sample_name = ""
+
+# each filter query as the list endpoint runs it: one page in key order
+QUERIES = {
+    "name": lambda: Inventory.find_by_name(sample_name),
+    "name_prefix": lambda: Inventory.find_by_filters(name=sample_name[:3]),
+    "condition": lambda: Inventory.find_by_condition(Condition.USED.value)
+    .order_by(Inventory.pid, Inventory.condition)
+    .limit(PAGE_SIZE),
+    "active": lambda: Inventory.find_by_active(True)
+    .order_by(Inventory.pid, Inventory.condition)
+    .limit(PAGE_SIZE),
+    "low_stock": lambda: Inventory.low_stock_select().limit(PAGE_SIZE),
+}
+
+
+# the index the SQLite plan of a query must use once create_indexes has run
+EXPECTED_INDEXES = {
+    "name": "ix_inventory_name",
+    "name_prefix": "ix_inventory_name",
+}
+
+
+def statement_of(query):
+    """Returns the select of an ORM query, or the select itself"""
+    return getattr(query, "statement", query)
+
+
+def plan(query):
+    """Returns the SQLite query plan of a query"""
+    if db.engine.dialect.name != "sqlite":
+        return ""
+    statement = statement_of(query)
+    sql = str(statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+    rows = db.session.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+    return "; ".join(row[-1] for row in rows)
+
+
+def report(label):
+    """Prints the median duration and plan of every filter query"""
+    # end the read transaction so the session sees the current schema
+    db.session.commit()
+    for name, query in QUERIES.items():
+        millis = timed(lambda query=query: db.session.execute(statement_of(query())).all())
+        print(f"  {label:>9} {name:>11} {millis:>9.2f} ms  {plan(query())}")
+
+
+def check_plans():
+    """Exits with an error when an indexed query does not use its index"""
+    failures = []
+    for name, index in EXPECTED_INDEXES.items():
+        text = plan(QUERIES[name]())
+        if text and f"USING INDEX {index}" not in text:
+            failures.append(f"{name} does not use {index}: {text}")
+    if failures:
+        sys.exit("\n".join(failures))
+
+
+def main(sizes):
+    """Seeds each table size and compares the filter queries with and without indexes"""
+    global sample_name  # pylint: disable=global-statement
+    for rows in sizes:
+        print(f"{rows} rows")
+        seed(rows)
+        sample_name = db.session.query(Inventory.name).filter(
+            Inventory.pid == min(SAMPLE_PID, rows - 1)
+        ).scalar()
+        for index in Inventory.__table__.indexes:
+            index.drop(bind=db.engine)
+        report("no index")
+        create_indexes(db.engine)
+        report("indexed")
+        check_plans()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000])
@@ -0,0 +1,94 @@
+"""
+Metrics Benchmark
+
+Measures the cost of the /metrics instrumentation. The request and SQL
+statement hooks are timed on their own, then requests and a query are
+timed with and without them; the end to end differences are only as
+precise as the run to run noise.
+
+Usage:
+    python -m benchmarks.bench_metrics [requests]
+"""
+import sys
+import time
+from types import SimpleNamespace
+from flask import Response
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from benchmarks.common import app, client, seed
+from service.models import db
+from service.common import metrics
+
+
+def per_call(func, count):
+    """Returns the mean duration of func in microseconds"""
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def without_hooks(func, count):
+    """Returns the mean duration of func with the request and query hooks removed"""
+    before = app.before_request_funcs[None]
+    after = app.after_request_funcs[None]
+    before.remove(metrics.start_timer)
+    after.remove(metrics.record_request)
+    event.remove(Engine, "before_cursor_execute", metrics.start_query_timer)
+    event.remove(Engine, "after_cursor_execute", metrics.record_query)
+    try:
+        return per_call(func, count)
+    finally:
+        before.append(metrics.start_timer)
+        after.append(metrics.record_request)
+        event.listen(Engine, "before_cursor_execute", metrics.start_query_timer)
+        event.listen(Engine, "after_cursor_execute", metrics.record_query)
+
+
+def best_of(rounds, func, count):
+    """Returns the fastest mean of a few interleaved rounds, without and with the hooks"""
+    bare = []
+    instrumented = []
+    for _ in range(rounds):
+        bare.append(without_hooks(func, count))
+        instrumented.append(per_call(func, count))
+    return min(bare), min(instrumented)
+
+
+def main(count: int):
+    """Times the instrumentation hooks alone and around real requests and queries"""
+    seed(1000)
+    test_client = client()
+    response = Response()
+    context = SimpleNamespace()
+
+    with app.test_request_context("/inventory/1"):
+        request_hooks = per_call(
+            lambda: (metrics.start_timer(), metrics.record_request(response)), count * 10
+        )
+    query_hooks = per_call(
+        lambda: (
+            metrics.start_query_timer(None, None, "SELECT 1", None, context, False),
+            metrics.record_query(None, None, "SELECT 1", None, context, False),
+        ),
+        count * 10,
+    )
+    print(f"request hooks          {request_hooks:8.2f} us per request")
+    print(f"query hooks            {query_hooks:8.2f} us per statement")
+
+    cases = {
+        "GET /health": lambda: test_client.get("/health"),
+        "GET /inventory/1": lambda: test_client.get("/inventory/1"),
+        "SELECT 1": lambda: db.session.execute(text("SELECT 1")),
+    }
+    for name, func in cases.items():
+        per_call(func, count // 10)  # warm up
+        bare, instrumented = best_of(5, func, count // 5)
+        print(
+            f"{name:<22} {bare:8.2f} us bare  {instrumented:8.2f} us instrumented"
+            f"  {instrumented - bare:+7.2f} us"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,35 @@
+"""
+Pagination Benchmark
+
+Compares the latency of the first page of GET /inventory against pages deep
+into the table. With keyset pagination every page should cost the same.
+
+Usage:
+    python -m benchmarks.bench_pagination [rows]
+"""
+import sys
+from benchmarks.common import client, seed, timed
+from service.common.pagination import encode_cursor
+from service.models import Condition
+
+PAGE_SIZE = 100
+
+
+def main(rows: int):
+    """Seeds the database and times pages at increasing depths"""
+    print(f"Seeding {rows} rows...")
+    seed(rows)
+    test_client = client()
+
+    print(f"{'depth':>10} {'median ms':>10}")
+    for depth in (0, rows // 4, rows // 2, rows - PAGE_SIZE * 2):
+        query = f"limit={PAGE_SIZE}"
+        if depth:
+            query += "&cursor=" + encode_cursor(depth, Condition.OPEN_BOX.value)
+        url = f"/inventory?{query}"
+        millis = timed(lambda url=url: test_client.get(url))
+        print(f"{depth:>10} {millis:>10.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
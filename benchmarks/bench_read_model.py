@@ -0,0 +1,66 @@
+"""
+Read Model Benchmark
+
+Compares loading Inventory items as ORM objects against the Core select of
+Inventory.select_rows(), which returns plain named tuples. For each size
+the memory held per loaded item (measured with tracemalloc) and the time to
+load and serialize the whole table are reported.
+
+Usage:
+    python -m benchmarks.bench_read_model [rows ...]
+"""
+import gc
+import sys
+import tracemalloc
+from benchmarks.common import app, seed, timed
+from service.models import db, Inventory, serialize_row
+
+
+def orm_items():
+    """Loads every item as an Inventory object"""
+    return Inventory.query.all()
+
+
+def core_rows():
+    """Loads every item as a row of the Core select"""
+    return Inventory.read_rows(Inventory.select_rows())
+
+
+def bytes_per_row(load, rows):
+    """Returns the memory still allocated per item after load returns"""
+    db.session.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    loaded = load()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del loaded
+    db.session.expunge_all()
+    return (after - before) / rows
+
+
+def main(sizes):
+    """Seeds each table size and compares the two read paths"""
+    for rows in sizes:
+        seed(rows)
+        with app.app_context():
+            orm_bytes = bytes_per_row(orm_items, rows)
+            core_bytes = bytes_per_row(core_rows, rows)
+
+            def orm_path():
+                items = [item.serialize() for item in orm_items()]
+                db.session.expunge_all()
+                return items
+
+            orm_millis = timed(orm_path, repeat=5)
+            core_millis = timed(lambda: [serialize_row(row) for row in core_rows()], repeat=5)
+        print(f"{rows} rows")
+        print(f"  memory  orm {orm_bytes:8.0f} B/row  core {core_bytes:8.0f} B/row"
+              f"  {orm_bytes / core_bytes:5.1f}x")
+        print(f"  time    orm {orm_millis:8.1f} ms     core {core_millis:8.1f} ms"
+              f"  {orm_millis / core_millis:5.1f}x  ({rows / core_millis * 1000:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
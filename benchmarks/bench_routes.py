@@ -0,0 +1,428 @@
+"""
+Route Load Benchmark
+
+Seeds the inventory table with N rows generated like InventoryFactory, starts
+the service in its own server process and drives every route of
+service/routes.py with concurrent keep-alive clients. The p50, p95 and p99
+latency, throughput and error count of each route are written to a JSON file,
+and two such files can be compared to catch regressions.
+
+Each database is seeded through its own engine, so the same run can cover a
+local SQLite file and a PostgreSQL stand-in (e.g. a postgres container). The
+rows are reproducible, so a table that already has N seeded rows is reused.
+Writes only touch keys above the seeded range and are removed after a run.
+
+Usage:
+    python -m benchmarks.bench_routes run [--rows 10000 100000 1000000]
+        [--database URI ...] [--server gunicorn|uvicorn] [--concurrency 8]
+        [--requests 200] [--output results.json]
+    python -m benchmarks.bench_routes compare baseline.json results.json [--threshold 10]
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from http.client import HTTPConnection, HTTPException
+import sqlalchemy
+from service.models import Inventory, create_schema
+from service.common.pagination import encode_cursor
+from tests.factories import inventory_rows
+
+SEED = 2022
+CHUNK_SIZE = 10000
+SAMPLE_KEYS = 1000
+BATCH_ITEMS = 100
+PAGE_SIZE = 100
+DEFAULT_DATABASE = "sqlite:////tmp/inventory-load.db"
+SERVERS = {
+    "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "service:app"],
+    "uvicorn": [sys.executable, "-m", "uvicorn", "service.asgi:app", "--log-level", "warning"],
+}
+
+
+######################################################################
+# SEEDING
+######################################################################
+def seed_database(uri, rows):
+    """Creates the schema and seeds rows items, unless they are already there"""
+    engine = sqlalchemy.create_engine(uri)
+    table = Inventory.__table__
+    create_schema(engine)
+    with engine.begin() as connection:
+        # keys above the seeded range were written by an earlier run
+        connection.execute(table.delete().where(table.c.pid >= rows))
+        count = connection.execute(sqlalchemy.select(sqlalchemy.func.count()).select_from(table))
+        count = count.scalar()
+    if count != rows:
+        print(f"  seeding {rows} rows...", flush=True)
+        with engine.begin() as connection:
+            connection.execute(table.delete())
+            generated = inventory_rows(rows, seed=SEED)
+            while True:
+                chunk = list(itertools.islice(generated, CHUNK_SIZE))
+                if not chunk:
+                    break
+                connection.execute(table.insert(), chunk)
+        with engine.begin() as connection:
+            connection.execute(sqlalchemy.text(f"ANALYZE {table.name}"))
+    sample = random.Random(SEED).sample(range(rows), min(rows, SAMPLE_KEYS))
+    with engine.connect() as connection:
+        keys = connection.execute(
+            sqlalchemy.select(table.c.pid, table.c.condition).where(table.c.pid.in_(sample))
+        ).all()
+    engine.dispose()
+    return [(pid, condition.value) for pid, condition in keys]
+
+
+def remove_writes(uri, rows):
+    """Deletes the items the run created above the seeded range"""
+    engine = sqlalchemy.create_engine(uri)
+    table = Inventory.__table__
+    with engine.begin() as connection:
+        connection.execute(table.delete().where(table.c.pid >= rows))
+    engine.dispose()
+
+
+######################################################################
+# SERVER
+######################################################################
+def free_port():
+    """Returns a TCP port nothing listens on"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(server, uri, port, timeout=30):
+    """Starts the service on port and waits until /health answers"""
+    env = dict(
+        os.environ,
+        DATABASE_URI=uri,
+        PORT=str(port),
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_LOG_LEVEL="warning",
+    )
+    command = SERVERS[server]
+    if server == "uvicorn":
+        command = command + ["--port", str(port)]
+    process = subprocess.Popen(  # pylint: disable=consider-using-with
+        command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"{server} did not start on port {port}")
+
+
+def stop_server(process):
+    """Stops the server and waits for it to exit"""
+    process.terminate()
+    process.wait(timeout=30)
+
+
+######################################################################
+# WORKLOAD
+######################################################################
+class Workload:
+    """The keys the requests of one run are built from"""
+
+    def __init__(self, rows, keys):
+        self.keys = keys
+        self.rng = random.Random(SEED)
+        # keys written by the run start above the seeded range
+        self.pids = itertools.count(rows)
+        self.created = deque()
+
+    def key(self):
+        """Returns the (pid, condition) of a seeded item"""
+        return self.rng.choice(self.keys)
+
+    def created_key(self):
+        """Returns the (pid, condition) of an item created by the run"""
+        return self.created[self.rng.randrange(len(self.created))]
+
+    def created_keys(self, count):
+        """Returns up to count (pid, condition) keys of items created by the run"""
+        return self.rng.sample(list(self.created), min(count, len(self.created)))
+
+    def new_item(self):
+        """Returns a new item in the write range"""
+        item = next(inventory_rows(1, start=next(self.pids), seed=self.rng.random()))
+        item["condition"] = item["condition"].value
+        return item
+
+    def create(self):
+        """POST /inventory with a new item, remembered for the later writes"""
+        item = self.new_item()
+        self.created.append((item["pid"], item["condition"]))
+        return "POST", "/inventory", item
+
+    def update(self):
+        """PUT /inventory/<pid> of a created item"""
+        item = self.new_item()
+        item["pid"], item["condition"] = self.created_key()
+        return "PUT", f"/inventory/{item['pid']}", item
+
+    def take_created(self):
+        """Removes a created key, or returns a key that no longer exists"""
+        try:
+            return self.created.popleft()
+        except IndexError:
+            return next(self.pids), 0
+
+
+def key_path(template):
+    """Builds a request for a seeded key"""
+    return lambda work: ("GET", template.format(*work.key()), None)
+
+
+def created_path(method, template, body=None):
+    """Builds a request for a key created by the run"""
+    return lambda work: (method, template.format(*work.created_key()), body)
+
+
+def cursor_page(work):
+    """A page of the list that starts after a random seeded key"""
+    return "GET", f"/inventory?limit={PAGE_SIZE}&cursor={encode_cursor(*work.key())}", None
+
+
+# (name, request builder, expected statuses), run in this order: the
+# writes to created items follow "create" and the deletes come last
+SCENARIOS = [
+    ("index", lambda work: ("GET", "/", None), {200}),
+    ("health", lambda work: ("GET", "/health", None), {200}),
+    ("health_ready", lambda work: ("GET", "/health/ready", None), {200}),
+    ("health_pool", lambda work: ("GET", "/health/pool", None), {200}),
+    ("list_first_page", lambda work: ("GET", f"/inventory?limit={PAGE_SIZE}", None), {200}),
+    ("list_page_after_cursor", cursor_page, {200}),
+    ("list_filtered_page", lambda work: (
+        "GET", f"/inventory?condition=0&active=true&limit={PAGE_SIZE}", None), {200}),
+    ("list_by_pid", key_path("/inventory?pid={0}"), {200}),
+    ("low_stock", lambda work: ("GET", f"/inventory/low-stock?limit={PAGE_SIZE}", None), {200}),
+    ("summary", lambda work: ("GET", "/inventory/summary", None), {200}),
+    ("get_pid", key_path("/inventory/{0}"), {200}),
+    ("get_item", key_path("/inventory/{0}?condition={1}"), {200}),
+    ("create", Workload.create, {201}),
+    ("batch_create", lambda work: (
+        "POST", "/inventory:batch", [work.new_item() for _ in range(BATCH_ITEMS)]), {201}),
+    ("update", Workload.update, {200}),
+    ("adjust", created_path("POST", "/inventory/{0}/{1}/adjust", {"delta": 1}), {200}),
+    ("activate", created_path("PUT", "/inventory/activate/{0}/{1}"), {200}),
+    ("deactivate", created_path("PUT", "/inventory/deactivate/{0}/{1}"), {200}),
+    ("activate_keys", lambda work: ("PUT", "/inventory/activate", [
+        {"pid": pid, "condition": condition} for pid, condition in work.created_keys(BATCH_ITEMS)
+    ]), {200}),
+    ("deactivate_by_filter", lambda work: (
+        "PUT", f"/inventory/deactivate?pid={work.created_key()[0]}", None), {200}),
+    ("delete_item", lambda work: ("DELETE", "/inventory/{0}/{1}".format(*work.take_created()), None), {204}),
+    ("delete_pid", lambda work: ("DELETE", f"/inventory/{work.take_created()[0]}", None), {204}),
+    ("delete_by_filter", lambda work: (
+        "DELETE", f"/inventory?pid={work.take_created()[0]}", None), {200}),
+]
+
+
+######################################################################
+# CLIENTS
+######################################################################
+def drive(port, build, expected, work, requests, concurrency):
+    """Sends requests built by build from concurrent clients
+
+    Returns the latency of every request in milliseconds, the number of
+    requests that failed or answered an unexpected status, and the wall time.
+    """
+    tickets = itertools.count()
+    durations = []
+    errors = []
+
+    def client():
+        connection = HTTPConnection("127.0.0.1", port, timeout=60)
+        while next(tickets) < requests:
+            method, path, body = build(work)
+            headers = {}
+            if body is not None:
+                body = json.dumps(body)
+                headers["Content-Type"] = "application/json"
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                failed = response.status not in expected
+            except (OSError, HTTPException):
+                connection.close()
+                connection = HTTPConnection("127.0.0.1", port, timeout=60)
+                failed = True
+            durations.append((time.perf_counter() - start) * 1000)
+            if failed:
+                errors.append(path)
+        connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return durations, len(errors), time.perf_counter() - start
+
+
+def summarize(durations, errors, wall):
+    """Returns the latency percentiles and throughput of a scenario"""
+    if len(durations) > 1:
+        cuts = statistics.quantiles(durations, n=100, method="inclusive")
+    else:
+        cuts = durations * 99
+    return {
+        "requests": len(durations),
+        "errors": errors,
+        "p50_ms": round(cuts[49], 3),
+        "p95_ms": round(cuts[94], 3),
+        "p99_ms": round(cuts[98], 3),
+        "throughput_rps": round(len(durations) / wall, 1),
+    }
+
+
+def run_database(args, uri, rows):
+    """Seeds one database and drives every route against it"""
+    database = sqlalchemy.engine.make_url(uri).get_backend_name()
+    print(f"{database}, {rows} rows", flush=True)
+    work = Workload(rows, seed_database(uri, rows))
+    port = free_port()
+    process = start_server(args.server, uri, port)
+    routes = {}
+    try:
+        for name, build, expected in SCENARIOS:
+            # warm up the connections and caches of every worker first
+            drive(port, build, expected, work, args.concurrency, args.concurrency)
+            result = summarize(*drive(port, build, expected, work, args.requests, args.concurrency))
+            routes[name] = result
+            print(
+                f"  {name:<24} p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}"
+                f"  p99 {result['p99_ms']:8.2f} ms  {result['throughput_rps']:8.1f} req/s"
+                f"  {result['errors']} errors",
+                flush=True,
+            )
+    finally:
+        stop_server(process)
+        remove_writes(uri, rows)
+    return {"database": database, "rows": rows, "routes": routes}
+
+
+def git_commit():
+    """Returns the commit the service was run from, if known"""
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+        return output.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    """Runs every database and size and writes the results"""
+    results = {
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "server": args.server,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "runs": [],
+    }
+    for uri in args.database or [DEFAULT_DATABASE]:
+        for rows in args.rows:
+            results["runs"].append(run_database(args, uri, rows))
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+######################################################################
+# COMPARE
+######################################################################
+def change(before, after):
+    """Returns the relative change in percent"""
+    return (after - before) / before * 100 if before else 0.0
+
+
+def compare(args):
+    """Prints the change of every route between two result files
+
+    Returns 1 when a p95 latency grew, or a throughput dropped, by more
+    than the threshold, so the comparison can gate a pipeline.
+    """
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    with open(args.results, encoding="utf-8") as file:
+        results = json.load(file)
+    before = {
+        (run_["database"], run_["rows"], name): route
+        for run_ in baseline["runs"]
+        for name, route in run_["routes"].items()
+    }
+    print(f"{baseline.get('commit')} -> {results.get('commit')}")
+    print(f"{'route':<24} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18} {'req/s':>18}")
+    regressions = []
+    for run_ in results["runs"]:
+        print(f"{run_['database']}, {run_['rows']} rows")
+        for name, route in run_["routes"].items():
+            old = before.get((run_["database"], run_["rows"], name))
+            if old is None:
+                print(f"  {name:<22} (new)")
+                continue
+            cells = []
+            for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+                cells.append(f"{route[metric]:9.2f} {change(old[metric], route[metric]):+7.1f}%")
+            print(f"  {name:<22} " + " ".join(cells))
+            if (
+                change(old["p95_ms"], route["p95_ms"]) > args.threshold
+                or change(old["throughput_rps"], route["throughput_rps"]) < -args.threshold
+            ):
+                regressions.append(f"{run_['database']}/{run_['rows']}/{name}")
+    if regressions:
+        print(f"Regressed by more than {args.threshold}%: " + ", ".join(regressions))
+        return 1
+    return 0
+
+
+def main(argv=None):
+    """Parses the command line and runs or compares benchmarks"""
+    parser = argparse.ArgumentParser(description="Load test every route of the service")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="seed the databases and drive every route")
+    run_parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    run_parser.add_argument("--database", action="append", help=f"default {DEFAULT_DATABASE}")
+    run_parser.add_argument("--server", choices=sorted(SERVERS), default="gunicorn")
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--requests", type=int, default=200, help="per route")
+    run_parser.add_argument("--output", default="benchmark-results.json")
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="percent")
+    args = parser.parse_args(argv)
+    return run(args) if args.command == "run" else compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
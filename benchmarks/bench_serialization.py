@@ -0,0 +1,57 @@
+"""
+Serialization Benchmark
+
+Compares the two ways GET /inventory can build a list response: ORM
+objects serialized and then marshaled by flask-restx, against row tuples
+encoded straight to JSON bytes. Both are timed in process and through the
+endpoint (with and without an X-Fields mask, which keeps the old path).
+
+Usage:
+    python -m benchmarks.bench_serialization [rows ...]
+"""
+import json
+import sys
+from flask_restx import marshal
+from benchmarks.common import app, client, seed, timed
+from service.models import Inventory
+from service.common import serializers
+from service.routes import inventory_model
+
+# every field, so the mask only switches the endpoint back to marshaling
+MASK = "pid,condition,name,quantity,restock_level,active,version"
+
+
+def marshaled():
+    """Builds the response body the way the endpoint used to"""
+    results = [item.serialize() for item in Inventory.query]
+    return json.dumps(marshal(results, inventory_model)).encode("utf-8")
+
+
+def from_rows():
+    """Builds the response body from row tuples"""
+    return serializers.dumps_rows(Inventory.read_rows(Inventory.select_rows()))
+
+
+def main(sizes):
+    """Seeds each table size and times both serialization paths"""
+    encoder = "orjson" if serializers.orjson is not None else "json"
+    test_client = client()
+    for rows in sizes:
+        seed(rows)
+        with app.app_context():
+            old = timed(marshaled, repeat=5)
+            new = timed(from_rows, repeat=5)
+        for headers in ({"X-Fields": MASK}, {}):
+            # an error response would be timed as if it were a list
+            response = test_client.get("/inventory", headers=headers)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        old_endpoint = timed(lambda: test_client.get("/inventory", headers={"X-Fields": MASK}), 5)
+        new_endpoint = timed(lambda: test_client.get("/inventory"), 5)
+        print(f"{rows} rows ({encoder})")
+        print(f"  in process  marshal {old:9.1f} ms  rows {new:9.1f} ms  {old / new:5.1f}x")
+        print(f"  endpoint    marshal {old_endpoint:9.1f} ms  rows {new_endpoint:9.1f} ms"
+              f"  {old_endpoint / new_endpoint:5.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
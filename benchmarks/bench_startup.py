@@ -0,0 +1,83 @@
+"""
+Startup Benchmark
+
+Measures how long a fresh worker takes from the first import to its first
+responses: GET /health, which needs no database, and GET /inventory, which
+opens the first connection. Each run is a new interpreter, like a forked
+gunicorn worker without the preloaded app.
+
+The eager mode does what importing the service used to do: push a global
+app context and create the tables before serving. The lazy mode is the
+current service, which connects on its first query. A delay can be added
+to every new connection to emulate a remote database that is slow to answer.
+
+Usage:
+    python -m benchmarks.bench_startup [runs] [connect delay in ms]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from benchmarks.common import seed
+
+WORKER = """
+import json, sys, time
+start = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+delay = float(sys.argv[2]) / 1000
+if delay:
+    event.listen(Pool, "connect", lambda *args: time.sleep(delay))
+from service import app
+from service.models import init_db
+if sys.argv[1] == "eager":
+    init_db(app)
+imported = time.perf_counter()
+client = app.test_client()
+client.get("/health")
+health = time.perf_counter()
+client.get("/inventory?limit=10")
+inventory = time.perf_counter()
+print(json.dumps({
+    "import": (imported - start) * 1000,
+    "health": (health - start) * 1000,
+    "inventory": (inventory - start) * 1000,
+}))
+"""
+
+
+def start_worker(mode, delay):
+    """Runs a fresh worker and returns its timings in milliseconds"""
+    output = subprocess.run(
+        [sys.executable, "-c", WORKER, mode, str(delay)],
+        check=True,
+        capture_output=True,
+        text=True,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"),
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main(runs: int, delay: float):
+    """Seeds a small table and compares the startup of both modes"""
+    seed(1000)
+    print(f"{runs} runs, {delay:.0f} ms per new connection, median ms since the first import")
+    print(f"{'mode':>6} {'import':>8} {'/health':>8} {'/inventory':>11}")
+    for mode in ("eager", "lazy"):
+        timings = [start_worker(mode, delay) for _ in range(runs)]
+        medians = {
+            key: statistics.median(timing[key] for timing in timings)
+            for key in ("import", "health", "inventory")
+        }
+        print(
+            f"{mode:>6} {medians['import']:>8.1f} {medians['health']:>8.1f}"
+            f" {medians['inventory']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 10,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 200,
+    )
@@ -0,0 +1,61 @@
+"""
+Validation Benchmark
+
+Compares the two ways POST /inventory:batch can validate a payload: an
+Inventory object deserialized per item, stopping at each bad one with an
+exception, against one validate_many pass that returns plain rows and
+every error with its position. One item in every hundred is invalid.
+
+Usage:
+    python -m benchmarks.bench_validation [items ...]
+"""
+import random
+import sys
+from benchmarks.common import timed
+from service.models import Inventory, Condition, DataValidationError
+
+
+def payload(count: int):
+    """Returns count items as a client would post them"""
+    items = [
+        {
+            "pid": pid,
+            "condition": random.randint(0, 2),
+            "name": f"item-{pid}",
+            "quantity": random.randint(0, 100),
+            "restock_level": random.randint(1, 100),
+            "active": True,
+        }
+        for pid in range(count)
+    ]
+    for item in items[::100]:
+        item["quantity"] = str(item["quantity"])
+    return items
+
+
+def per_item(items):
+    """Validates items one Inventory object at a time"""
+    valid = []
+    errors = []
+    for index, data in enumerate(items):
+        try:
+            valid.append(Inventory(pid=-100, condition=Condition(0)).deserialize(data))
+        except DataValidationError as error:
+            errors.append((index, str(error)))
+    return valid, errors
+
+
+def main(sizes):
+    """Times both validation paths for each payload size"""
+    for count in sizes:
+        items = payload(count)
+        old = timed(lambda items=items: per_item(items), repeat=5)
+        new = timed(lambda items=items: Inventory.validate_many(items), repeat=5)
+        print(
+            f"{count:>7} items  per item {old:8.1f} ms  validate_many {new:8.1f} ms"
+            f"  {old / new:5.1f}x  ({count / new * 1000:,.0f} items/s)"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
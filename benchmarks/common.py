@@ -0,0 +1,53 @@
+"""
+Benchmark Helpers
+
+This module contains utility functions shared by the benchmark scripts.
+It must be imported before the service so the benchmark database is used.
+"""
+import itertools
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URI", "sqlite:////tmp/inventory-bench.db")
+
+# pylint: disable=wrong-import-position
+from service import app  # noqa: E402
+from service.models import db, init_db, Inventory  # noqa: E402
+from tests.factories import inventory_rows  # noqa: E402
+
+# the service connects lazily, the benchmarks create the tables up front
+init_db(app)
+
+CHUNK_SIZE = 10000
+# every run seeds the same rows, so the timings of two runs compare
+SEED = 2022
+
+
+def seed(count: int):
+    """Recreates the inventory table and fills it with count random rows, the same on every run"""
+    db.drop_all()
+    db.create_all()
+    table = Inventory.__table__
+    generated = inventory_rows(count, seed=SEED)
+    while True:
+        rows = list(itertools.islice(generated, CHUNK_SIZE))
+        if not rows:
+            break
+        db.session.execute(table.insert(), rows)
+    db.session.commit()
+
+
+def timed(func, repeat: int = 20):
+    """Calls func repeat times and returns the median duration in milliseconds"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def client():
+    """Returns a test client for the service"""
+    return app.test_client()
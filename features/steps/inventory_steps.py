@@ -11,13 +11,10 @@ from compare import expect
 @given('the following items')
 def step_impl(context):
     """ Delete all Previous Items and load new ones """
-    # List all of the items and delete them one by one
+    # Delete all of the items with a single request
     rest_endpoint = f"{context.BASE_URL}/inventory"
-    context.resp = requests.get(rest_endpoint)
+    context.resp = requests.delete(rest_endpoint, params={"all": "true"})
     expect(context.resp.status_code).to_equal(200)
-    for item in context.resp.json():
-        context.resp = requests.delete(f"{rest_endpoint}/{item['pid']}/{item['condition']}")
-        expect(context.resp.status_code).to_equal(204)
 
     # load the database with new pets
     for row in context.table:
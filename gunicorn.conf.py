@@ -0,0 +1,170 @@
+"""
+Gunicorn configuration
+
+Sizes the workers to the resource limits of the container. The CPU and
+memory limits are read from the cgroup (v2, or v1 as a fallback) and every
+setting can be overridden from the environment:
+
+    GUNICORN_WORKERS        number of worker processes
+    GUNICORN_THREADS        threads per worker (gthread workers)
+    GUNICORN_WORKER_CLASS   sync, gthread, ...
+    GUNICORN_WORKER_MEMORY  expected resident size of one worker in MiB
+    GUNICORN_MAX_REQUESTS   requests a worker serves before it is recycled
+    GUNICORN_TIMEOUT        seconds a request may take before its worker is killed
+    GUNICORN_INIT_DB        1 to create the schema in the master, for a single instance
+    GUNICORN_INIT_DB_WAIT   seconds the master waits for the database to come up
+
+The app is loaded once in the master (preload_app), so the workers share
+its memory copy-on-write, and each worker opens its own connection pool
+on its first request. The schema is created by "flask db-init", which
+deploy/db-init-job.yaml runs once per deploy; the master only creates it
+itself when GUNICORN_INIT_DB=1, before it opens its socket.
+"""
+import gc
+import math
+import os
+import time
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def read_first(*paths):
+    """Returns the stripped contents of the first file that can be read"""
+    for path in paths:
+        try:
+            with open(path, encoding="ascii") as file:
+                return file.read().strip()
+        except OSError:
+            continue
+    return None
+
+
+def cgroup_cpus(root=CGROUP_ROOT):
+    """Returns the CPU limit of the cgroup in CPUs, or None when it is unlimited"""
+    text = read_first(os.path.join(root, "cpu.max"))
+    if text is not None:
+        quota, _, period = text.partition(" ")
+        if quota == "max":
+            return None
+        return int(quota) / int(period or 100000)
+    quota = read_first(os.path.join(root, "cpu", "cpu.cfs_quota_us"))
+    period = read_first(os.path.join(root, "cpu", "cpu.cfs_period_us"))
+    if quota is None or period is None or int(quota) <= 0:
+        return None
+    return int(quota) / int(period)
+
+
+def cgroup_memory(root=CGROUP_ROOT):
+    """Returns the memory limit of the cgroup in bytes, or None when it is unlimited"""
+    text = read_first(
+        os.path.join(root, "memory.max"),
+        os.path.join(root, "memory", "memory.limit_in_bytes"),
+    )
+    if text is None or text == "max":
+        return None
+    limit = int(text)
+    # cgroup v1 reports "unlimited" as a huge page aligned number
+    return None if limit >= 2**60 else limit
+
+
+def worker_count(cpus, memory, worker_memory):
+    """Returns (2 x CPUs + 1) workers, as many as fit in the memory limit, at least one"""
+    workers = 2 * math.ceil(cpus) + 1 if cpus is not None else 2 * (os.cpu_count() or 1) + 1
+    if cpus is not None and cpus < 1:
+        # a fraction of a CPU cannot keep more than one process busy
+        workers = 1
+    if memory is not None:
+        workers = min(workers, memory // worker_memory)
+    return max(1, workers)
+
+
+CPUS = cgroup_cpus()
+MEMORY = cgroup_memory()
+WORKER_MEMORY = int(os.getenv("GUNICORN_WORKER_MEMORY", "40")) * 1024 * 1024
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("GUNICORN_WORKERS", "0")) or worker_count(CPUS, MEMORY, WORKER_MEMORY)
+# threads share the memory of their worker, so they add concurrency for
+# requests waiting on the database where a process would not fit
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread" if threads > 1 else "sync")
+
+# recycle workers regularly so a slow leak cannot grow into an OOM kill
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = max_requests // 10
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = timeout
+
+preload_app = True
+# heartbeat files on tmpfs, so a slow container disk cannot stall the workers
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+# off by default: every replica would race on the DDL and serve nothing,
+# not even /health, until it is done
+INIT_DB = os.getenv("GUNICORN_INIT_DB", "0") == "1"
+INIT_DB_WAIT = float(os.getenv("GUNICORN_INIT_DB_WAIT", "60"))
+
+
+def init_schema(log, wait):
+    """Creates the missing schema, retrying while the database is unreachable
+
+    An instance that runs the same DDL at the same time makes it fail with a
+    ProgrammingError or an IntegrityError; create_schema only creates what is
+    still missing, so it is retried as well.
+    """
+    # pylint: disable=import-outside-toplevel
+    from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+    from service import app
+    from service.models import db, create_schema
+
+    deadline = time.monotonic() + wait
+    delay = 0.5
+    with app.app_context():
+        while True:
+            try:
+                columns, widened, indexes = create_schema(db.engine)
+                break
+            except (OperationalError, ProgrammingError, IntegrityError) as error:
+                if time.monotonic() + delay > deadline:
+                    raise
+                log.warning("Database is not ready, retrying in %.1fs: %s", delay, error.orig)
+                time.sleep(delay)
+                delay = min(2 * delay, 5.0)
+        # the workers open their own connections
+        db.engine.dispose()
+    for name in columns:
+        log.info("Added column %s", name)
+    for name in widened:
+        log.info("Widened column %s", name)
+    for name in indexes:
+        log.info("Created index %s", name)
+
+
+def on_starting(server):
+    """Logs the limits the workers were sized from and creates the schema"""
+    server.log.info(
+        "cgroup limits: cpus=%s memory=%s, starting %d %s worker(s) with %d thread(s)",
+        CPUS,
+        MEMORY,
+        workers,
+        worker_class,
+        threads,
+    )
+    if INIT_DB:
+        init_schema(server.log, INIT_DB_WAIT)
+
+
+def pre_fork(server, worker):  # pylint: disable=unused-argument
+    """Freezes the preloaded objects so the garbage collector leaves their pages shared"""
+    gc.freeze()
+
+
+def post_fork(server, worker):  # pylint: disable=unused-argument
+    """Drops the database connections inherited from the master without closing them"""
+    # pylint: disable=import-outside-toplevel
+    from service import app
+    from service.models import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
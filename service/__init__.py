@@ -4,7 +4,6 @@ Package for the application models and service routes
 This module creates and configures the Flask app and sets up the logging
 and SQL database
 """
-import sys
 from flask import Flask
 from service import config
 from .common import log_handlers  # noqa: F401, E402
@@ -18,7 +17,7 @@ app.config.from_object(config)
 from service import routes  # noqa: E402, E261
 
 # pylint: disable=wrong-import-position
-from .common import error_handlers, cli_commands  # noqa: F401 E402
+from .common import error_handlers, cli_commands, metrics, profiling  # noqa: F401 E402
 
 # Set up logging for production
 log_handlers.init_logging(app, "gunicorn.error")
@@ -27,11 +26,8 @@ app.logger.info(70 * "*")
 app.logger.info("  S E R V I C E   R U N N I N G  ".center(70, "*"))
 app.logger.info(70 * "*")
 
-try:
-    routes.init_db()  # make our SQLAlchemy tables
-except Exception as error:
-    app.logger.critical("%s: Cannot continue", error)
-    # gunicorn requires exit code 4 to stop spawning workers when they die
-    sys.exit(4)
+# the tables are created once with "flask db-init", so importing the app
+# never waits on the database
+routes.init_app()
 
 app.logger.info("Service initialized!")
@@ -0,0 +1,205 @@
+"""
+ASGI Application
+
+Serves the inventory service from an event loop:
+
+    uvicorn service.asgi:app
+
+The hot read-only routes, listing inventory and reading the items of a
+PID, run their Core selects through an async driver, so a request that
+waits on the database does not hold a worker and many of them share one
+process. Every other request is passed to the Flask app running in a
+thread pool, and so is any read the async path does not answer exactly
+like Flask would (X-Fields masks, NDJSON, conditional requests, invalid
+arguments and missing items), so both serving modes have the same routes.
+"""
+import re
+import time
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from uvicorn.middleware.wsgi import WSGIMiddleware
+from werkzeug.http import quote_etag
+from werkzeug.urls import url_decode, url_encode
+from service import app as flask_app
+from service.models import (
+    Inventory,
+    DataValidationError,
+    parse_condition,
+    parse_pid,
+    parse_sort,
+    serialize_row,
+)
+from service.routes import item_etag, items_etag, parse_filters, decode_key_cursor
+from service.common import serializers, status
+from service.common.metrics import REQUEST_DURATION
+from service.common.pagination import DEFAULT_PAGE_SIZE, encode_cursor, parse_limit
+
+# the async driver used for each database
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+ITEM_PATH = re.compile(r"^/inventory/(\d+)$")
+
+
+def async_database_uri(uri):
+    """Returns a database URI with the async driver of its database"""
+    scheme, rest = uri.split("://", 1)
+    database = scheme.split("+", 1)[0]
+    if database == "postgres":
+        database = "postgresql"
+    if database not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for {scheme} databases")
+    return f"{ASYNC_DRIVERS[database]}://{rest}"
+
+
+def async_engine_options(options):
+    """Returns the engine options without the pool class of the sync engine"""
+    options = dict(options)
+    # asyncio needs its own queue pool, the sizes and timeouts still apply
+    options.pop("poolclass", None)
+    return options
+
+
+class InventoryASGI:
+    """Answers the hot read-only routes with async queries, everything else with Flask"""
+
+    def __init__(self, wsgi_app, database_uri, engine_options=None, workers=10):
+        self.engine = create_async_engine(
+            async_database_uri(database_uri), **async_engine_options(engine_options or {})
+        )
+        self.session = sessionmaker(self.engine, class_=AsyncSession)
+        self.fallback = WSGIMiddleware(wsgi_app, workers=workers)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] == "http" and scope["method"] == "GET":
+            start = time.perf_counter()
+            response = await self.read(scope)
+            if response is not None:
+                endpoint, code, headers, body = response
+                await send({"type": "http.response.start", "status": code, "headers": headers})
+                await send({"type": "http.response.body", "body": body})
+                REQUEST_DURATION.observe(
+                    (endpoint, "GET", str(code)), time.perf_counter() - start
+                )
+                return
+        await self.fallback(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        """Disposes of the database connections when the server shuts down"""
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def read(self, scope):
+        """Returns (endpoint, status, headers, body), or None to let Flask answer"""
+        headers = dict(scope["headers"])
+        if b"x-fields" in headers or b"if-none-match" in headers:
+            return None
+        if b"ndjson" in headers.get(b"accept", b""):
+            return None
+        args = url_decode(scope["query_string"])
+        path = scope["path"].rstrip("/")
+        try:
+            if path == "/inventory":
+                return await self.list_inventory(scope, headers, args)
+            match = ITEM_PATH.match(path)
+            if match:
+                return await self.get_inventory(match.group(1), args)
+        except DataValidationError:
+            return None
+        return None
+
+    async def rows(self, statement):
+        """Returns all the rows of a select of Inventory.select_rows()"""
+        async with self.session() as session:
+            result = await session.execute(statement)
+            return result.all()
+
+    async def list_inventory(self, scope, headers, args):
+        """GET /inventory with filters and keyset pages"""
+        filters = parse_filters(args)
+        sort = args.get("sort") or None
+        limit = args.get("limit")
+        cursor = args.get("cursor")
+        if sort and (limit is not None or cursor is not None):
+            return None
+        statement = Inventory.select_rows(*Inventory.filter_criteria(**filters))
+
+        response_headers = [(b"content-type", b"application/json")]
+        if limit is None and cursor is None:
+            if sort:
+                statement = statement.order_by(*parse_sort(sort))
+            rows = await self.rows(statement)
+        else:
+            limit = parse_limit(limit or DEFAULT_PAGE_SIZE)
+            after = decode_key_cursor(cursor) if cursor else None
+            rows = await self.rows(Inventory.page_select(statement, limit + 1, after))
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                next_args = args.to_dict()
+                next_args["limit"] = limit
+                next_args["cursor"] = encode_cursor(last.pid, last.condition.value)
+                next_url = f"{base_url(scope, headers)}/inventory?{url_encode(next_args)}"
+                link = f'<{next_url}>; rel="next"'
+                response_headers.append((b"link", link.encode("latin-1")))
+
+        body = serializers.dumps_rows(rows)
+        return "inventory_collection", status.HTTP_200_OK, response_headers, body
+
+    async def get_inventory(self, pid, args):
+        """GET /inventory/<pid> with an optional condition"""
+        condition = args.get("condition")
+        columns = Inventory.__table__.c
+        if condition:
+            key = (parse_pid(pid), parse_condition(condition))
+            data = Inventory.cache.get(key)
+            if data is None:
+                generation = Inventory.cache.generation
+                statement = Inventory.select_rows(
+                    columns.pid == key[0], columns.condition == key[1]
+                )
+                rows = await self.rows(statement)
+                if not rows:
+                    return None
+                data = serialize_row(rows[0])
+                Inventory.cache.set(key, data, generation)
+            etag = item_etag(data["version"])
+        else:
+            statement = Inventory.select_rows(*Inventory.filter_criteria(pid=pid))
+            rows = await self.rows(statement)
+            if not rows:
+                return None
+            data = [serialize_row(row) for row in rows]
+            etag = items_etag((row.condition, row.version) for row in rows)
+
+        response_headers = [
+            (b"content-type", b"application/json"),
+            (b"etag", quote_etag(etag).encode("latin-1")),
+        ]
+        body = serializers.dumps(data)
+        return "inventory_resource", status.HTTP_200_OK, response_headers, body
+
+
+def base_url(scope, headers):
+    """Returns the scheme, host and root path the request was sent to"""
+    host = headers.get(b"host")
+    if host is None:
+        server, port = scope.get("server") or ("localhost", 80)
+        host = f"{server}:{port}".encode("latin-1")
+    return f"{scope.get('scheme', 'http')}://{host.decode('latin-1')}{scope.get('root_path', '')}"
+
+
+app = InventoryASGI(
+    flask_app,
+    flask_app.config["SQLALCHEMY_DATABASE_URI"],
+    flask_app.config.get("SQLALCHEMY_ENGINE_OPTIONS"),
+    workers=flask_app.config.get("ASGI_WSGI_WORKERS", 10),
+)
@@ -0,0 +1,74 @@
+"""
+Cache
+
+This module contains a small in-process cache for the values of hot
+rows, bounded both by size (least recently used) and by age
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """A thread safe least recently used cache whose entries expire"""
+
+    def __init__(self, maxsize=1024, ttl=30.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # bumped by every invalidation so a value read before it is not stored
+        self.generation = 0
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the value stored under key, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key, value, generation=None):
+        """Stores a value unless the cache was invalidated since generation"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (value, self._clock() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, *keys):
+        """Removes the values stored under keys"""
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        """Removes every value"""
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def stats(self):
+        """Returns the hit and miss counters and the current size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
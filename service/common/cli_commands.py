@@ -2,7 +2,7 @@
 Flask CLI Command Extensions
 """
 from service import app
-from service.models import db
+from service.models import db, create_indexes, create_schema
 
 
 ######################################################################
@@ -19,3 +19,39 @@ def db_create():
     db.drop_all()
     db.create_all()
     db.session.commit()
+
+
+######################################################################
+# Command to create the schema once before the service starts
+# Usage:
+#   flask db-init
+######################################################################
+@app.cli.command("db-init")
+def db_init():
+    """
+    Creates the tables, columns and indexes that are missing and widens
+    the columns that are too narrow, keeping every row. Safe to run on
+    every deploy and on an existing database.
+    """
+    columns, widened, indexes = create_schema(db.engine)
+    for name in columns:
+        app.logger.info("Added column %s", name)
+    for name in widened:
+        app.logger.info("Widened column %s", name)
+    for name in indexes:
+        app.logger.info("Created index %s", name)
+
+
+######################################################################
+# Command to add missing indexes to an existing database
+# Usage:
+#   flask db-create-indexes
+######################################################################
+@app.cli.command("db-create-indexes")
+def db_create_indexes():
+    """
+    Creates the Inventory indexes that are missing on an existing
+    database without touching any rows
+    """
+    for name in create_indexes(db.engine):
+        app.logger.info("Created index %s", name)
@@ -20,12 +20,29 @@ Module: error_handlers
 from flask import jsonify
 from service.models import DataValidationError
 from service import app
+from service.routes import api
 from . import status
 
 
 ######################################################################
 # Error Handlers
 ######################################################################
+@api.errorhandler(DataValidationError)
+def api_validation_error(error):
+    """Handles Value Errors from bad data in the flask-restx resources
+
+    flask-restx only hands errors to the app handlers when TESTING or
+    PROPAGATE_EXCEPTIONS is on, so the resources need their own handler.
+    """
+    message = str(error)
+    app.logger.warning(message)
+    return {
+        "status": status.HTTP_400_BAD_REQUEST,
+        "error": "Bad Request",
+        "message": message,
+    }, status.HTTP_400_BAD_REQUEST
+
+
 @app.errorhandler(DataValidationError)
 def request_validation_error(error):
     """Handles Value Errors from bad data"""
@@ -0,0 +1,244 @@
+"""
+Module: metrics
+
+Request and database latency histograms of this worker, exported at
+/metrics in the Prometheus text format
+
+Every response also reports the SQL statements its request ran in the
+X-DB-Queries and Server-Timing headers, and statements slower than
+SLOW_QUERY_MS are logged with their parameters.
+"""
+import bisect
+import threading
+import time
+from flask import Response, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from service.models import db, Inventory
+from service import app
+from . import status
+from .pool import pool_stats
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# upper bounds in seconds of the latency buckets
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+# statements are labeled by their first keyword, anything else is OTHER
+OPERATIONS = frozenset(("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"))
+
+# statements at least this slow are logged, 0 turns the log off
+SLOW_QUERY_SECONDS = app.config.get("SLOW_QUERY_MS", 200) / 1000
+
+# the longest repr of the parameters of a slow statement that is logged
+PARAMETERS_LOG_LIMIT = 1000
+
+# pool and cache statistics that only ever grow
+COUNTERS = frozenset(("checkouts", "timeouts", "wait_seconds_total", "hits", "misses"))
+
+
+class Histogram:
+    """Counts observations into buckets for every combination of labels"""
+
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        """Records a value for a tuple of label values"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        """Returns the label values with cumulative bucket counts, count and sum"""
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = []
+            total = 0
+            for count in values[:-1]:
+                total += count
+                cumulative.append(total)
+            yield labels, cumulative, total, values[-1]
+
+    def render(self):
+        """Returns the histogram in the Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bounds = [format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, cumulative, count, total in self.samples():
+            pairs = list(zip(self.labelnames, labels))
+            for bound, value in zip(bounds, cumulative):
+                lines.append(f"{self.name}_bucket{format_labels(pairs + [('le', bound)])} {value}")
+            lines.append(f"{self.name}_sum{format_labels(pairs)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(pairs)} {count}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request.",
+    ("endpoint", "method", "status"),
+    REQUEST_BUCKETS,
+)
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Time spent executing a SQL statement.",
+    ("operation",),
+    QUERY_BUCKETS,
+)
+REQUEST_STATEMENTS = Histogram(
+    "http_request_db_statements",
+    "SQL statements executed by a request.",
+    ("endpoint", "method"),
+    STATEMENT_BUCKETS,
+)
+
+# [statements, seconds] of the request handled by this thread, the
+# statements run in the same thread as the request that issued them
+request_queries = threading.local()
+
+
+def format_value(value):
+    """Formats a sample value"""
+    if isinstance(value, bool):
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def escape_label(value):
+    """Escapes a label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(pairs):
+    """Formats label names and values as {name="value",...}"""
+    text = ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs)
+    return "{" + text + "}" if text else ""
+
+
+def render_stats(prefix, description, stats):
+    """Returns a statistics dict as one unlabeled metric per key"""
+    lines = []
+    for key, value in stats.items():
+        if not isinstance(value, (int, float)):
+            continue
+        name = f"{prefix}_{key}"
+        lines.append(f"# HELP {name} {description} {key.replace('_', ' ')}.")
+        lines.append(f"# TYPE {name} {'counter' if key in COUNTERS else 'gauge'}")
+        lines.append(f"{name} {format_value(value)}")
+    return lines
+
+
+def render():
+    """Returns every metric of this worker in the Prometheus text format"""
+    lines = []
+    count = "http_requests_total"
+    lines.append(f"# HELP {count} Number of requests handled.")
+    lines.append(f"# TYPE {count} counter")
+    for labels, _, total, _ in REQUEST_DURATION.samples():
+        lines.append(f"{count}{format_labels(zip(REQUEST_DURATION.labelnames, labels))} {total}")
+    lines.extend(REQUEST_DURATION.render())
+    lines.extend(QUERY_DURATION.render())
+    lines.extend(REQUEST_STATEMENTS.render())
+    lines.extend(render_stats("db_pool", "Database connection pool", pool_stats(db.engine.pool)))
+    lines.extend(render_stats("inventory_cache", "Inventory item cache", Inventory.cache.stats()))
+    return "\n".join(lines) + "\n"
+
+
+######################################################################
+# Request and query hooks
+######################################################################
+# each access through the request proxy costs microseconds, so the hooks
+# resolve it once and keep the start time in the WSGI environ
+@app.before_request
+def start_timer():
+    """Notes when the request started and starts counting its statements"""
+    request.environ["metrics.start"] = time.perf_counter()
+    request_queries.stats = [0, 0.0]
+
+
+@app.after_request
+def record_request(response):
+    """Records the duration and statements of the request, reported in its headers
+
+    A streamed body runs its statements after this, they are not counted.
+    """
+    # pylint: disable=protected-access
+    current = request._get_current_object()
+    start = current.environ.pop("metrics.start", None)
+    stats = getattr(request_queries, "stats", None)
+    request_queries.stats = None
+    if start is not None:
+        elapsed = time.perf_counter() - start
+        endpoint = current.endpoint or "unmatched"
+        REQUEST_DURATION.observe((endpoint, current.method, str(response.status_code)), elapsed)
+        if stats is not None:
+            statements, seconds = stats
+            REQUEST_STATEMENTS.observe((endpoint, current.method), statements)
+            headers = response.headers
+            headers.add("X-DB-Queries", str(statements))
+            headers.add(
+                "Server-Timing",
+                f'db;dur={seconds * 1000:.2f};desc="SQL", '
+                f"total;dur={elapsed * 1000:.2f}",
+            )
+    return response
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    """Notes when a statement started"""
+    # pylint: disable=unused-argument, too-many-arguments
+    context.metrics_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    """Records the duration of a statement by its operation and for its request"""
+    # pylint: disable=unused-argument, too-many-arguments
+    elapsed = time.perf_counter() - context.metrics_start
+    operation = statement.lstrip()[:6].upper()
+    if operation not in OPERATIONS:
+        operation = "WITH" if operation.startswith("WITH") else "OTHER"
+    QUERY_DURATION.observe((operation,), elapsed)
+    stats = getattr(request_queries, "stats", None)
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+    if SLOW_QUERY_SECONDS and elapsed >= SLOW_QUERY_SECONDS:
+        log_slow_query(statement, parameters, executemany, elapsed)
+
+
+def log_slow_query(statement, parameters, executemany, elapsed):
+    """Logs a slow statement with its (truncated) parameters"""
+    shown = repr(parameters)
+    if len(shown) > PARAMETERS_LOG_LIMIT:
+        shown = shown[:PARAMETERS_LOG_LIMIT] + "..."
+    app.logger.warning(
+        "Slow query (%.1f ms%s): %s parameters=%s",
+        elapsed * 1000,
+        f", {len(parameters)} rows" if executemany else "",
+        " ".join(statement.split()),
+        shown,
+    )
+
+
+######################################################################
+# GET METRICS
+######################################################################
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Returns the metrics of this worker in the Prometheus text format"""
+    return Response(render(), status=status.HTTP_200_OK, content_type=CONTENT_TYPE)
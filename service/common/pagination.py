@@ -0,0 +1,48 @@
+"""
+Pagination
+
+This module contains utility functions to encode and decode the opaque
+cursors used for keyset pagination
+"""
+import base64
+import binascii
+import json
+from service.models import DataValidationError
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(*values):
+    """Encodes the key values of the last row of a page into an opaque cursor"""
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, length: int):
+    """Decodes an opaque cursor back into a list of key values"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError) as error:
+        raise DataValidationError(f"Cursor {cursor} is invalid") from error
+
+    if not isinstance(values, list) or len(values) != length:
+        raise DataValidationError(f"Cursor {cursor} is invalid")
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        raise DataValidationError(f"Cursor {cursor} is invalid")
+    return values
+
+
+def parse_limit(limit):
+    """Validates the page size requested by a client"""
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError) as error:
+        raise DataValidationError(f"Limit {limit} is invalid") from error
+
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise DataValidationError(
+            f"Limit {limit} is invalid: must be between 1 and {MAX_PAGE_SIZE}"
+        )
+    return limit
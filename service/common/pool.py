@@ -0,0 +1,94 @@
+"""
+Connection Pool
+
+This module contains the engine options of the database connection pool
+and a pool that records how long requests wait to check out a connection
+"""
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+
+class TimedQueuePool(QueuePool):
+    """A QueuePool that keeps statistics about the checkout wait time"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.timeouts += timed_out
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+
+    def wait_stats(self):
+        """Returns the checkout counters and wait times in seconds"""
+        with self._stats_lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_total,
+                "wait_seconds_max": self.wait_max,
+            }
+
+
+def engine_options(uri, pool_size, max_overflow, timeout, recycle, pre_ping):
+    """Returns the SQLAlchemy engine options of the connection pool
+
+    SQLite databases keep the pool SQLAlchemy picks for them, only the
+    server databases get a sized TimedQueuePool.
+    """
+    options = {"pool_pre_ping": pre_ping}
+    if not uri.startswith("sqlite"):
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=timeout,
+            pool_recycle=recycle,
+        )
+    return options
+
+
+def pool_stats(pool):
+    """Returns the state of a connection pool
+
+    saturation is the share of the pool capacity (size plus overflow)
+    that is checked out, it is None when the overflow is unlimited.
+    """
+    stats = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        size = pool.size()
+        # pylint: disable=protected-access
+        max_overflow = pool._max_overflow
+        checked_out = pool.checkedout()
+        capacity = size + max_overflow if max_overflow >= 0 else None
+        stats.update(
+            {
+                "size": size,
+                "max_overflow": max_overflow,
+                "checked_in": pool.checkedin(),
+                "checked_out": checked_out,
+                "overflow": max(pool.overflow(), 0),
+                "saturation": checked_out / capacity if capacity else None,
+            }
+        )
+    if isinstance(pool, TimedQueuePool):
+        stats.update(pool.wait_stats())
+    return stats
@@ -0,0 +1,174 @@
+"""
+Module: profiling
+
+Opt-in cProfile profiles of single requests, to see where the time of a
+slow endpoint goes inside Flask and flask-restx. A request is profiled when
+it sends the PROFILE_TOKEN in an X-Profile-Token header, or when it is
+drawn by PROFILE_SAMPLE_RATE. Every profile is saved as a pstats file in
+PROFILE_DIR, the newest PROFILE_KEEP are kept, and they are listed and
+downloaded from /admin/profiles with the same header.
+
+Without a token or a sample rate nothing is wrapped or registered, so the
+requests run exactly as they would without this module.
+"""
+import hmac
+import io
+import os
+import pstats
+import random
+from datetime import datetime, timezone
+from flask import Response, abort, current_app, jsonify, request, send_from_directory, url_for
+from werkzeug.middleware.profiler import ProfilerMiddleware
+from service import app
+from . import status
+
+TOKEN_HEADER = "X-Profile-Token"
+ADMIN_PATH = "/admin/profiles"
+
+# the time first, so the names sort from the oldest to the newest profile
+FILENAME_FORMAT = "{time:.6f}.{method}.{path}.{elapsed:.0f}ms.prof"
+
+
+class RequestProfiler:
+    """WSGI middleware that profiles the requests that ask for it and a sample of the others"""
+
+    def __init__(self, wsgi_app, profile_dir, token=None, sample_rate=0.0, keep=50):
+        # pylint: disable=too-many-arguments
+        self.wsgi_app = wsgi_app
+        self.profile_dir = profile_dir
+        self.token = token.encode("utf-8") if token else None
+        self.sample_rate = sample_rate
+        self.keep = keep
+        os.makedirs(profile_dir, exist_ok=True)
+        self.profiler = ProfilerMiddleware(
+            wsgi_app, stream=None, profile_dir=profile_dir, filename_format=FILENAME_FORMAT
+        )
+
+    def __call__(self, environ, start_response):
+        if not self.wants_profile(environ):
+            return self.wsgi_app(environ, start_response)
+        # the profiled response is buffered, so its body is generated inside the profile
+        try:
+            return self.profiler(environ, start_response)
+        finally:
+            self.prune()
+
+    def has_token(self, token):
+        """Returns True if token is the profiling token"""
+        if self.token is None or token is None:
+            return False
+        return hmac.compare_digest(token.encode("utf-8"), self.token)
+
+    def wants_profile(self, environ):
+        """Returns True if the request asked to be profiled or was sampled"""
+        if environ.get("PATH_INFO", "").startswith(ADMIN_PATH):
+            return False
+        if self.has_token(environ.get("HTTP_X_PROFILE_TOKEN")):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def profiles(self):
+        """Returns the names of the saved profiles, the newest first"""
+        try:
+            names = os.listdir(self.profile_dir)
+        except FileNotFoundError:
+            return []
+        return sorted((name for name in names if name.endswith(".prof")), reverse=True)
+
+    def prune(self):
+        """Removes the oldest profiles beyond the number to keep"""
+        for name in self.profiles()[self.keep:]:
+            try:
+                os.remove(os.path.join(self.profile_dir, name))
+            except FileNotFoundError:
+                pass  # another worker removed it first
+
+
+def init_profiling(flask_app):
+    """Wraps the app in a RequestProfiler if a token or a sample rate is configured
+
+    The admin endpoints are only registered with a token, which they require.
+    Returns the profiler, or None when profiling is off.
+    """
+    token = flask_app.config.get("PROFILE_TOKEN")
+    sample_rate = flask_app.config.get("PROFILE_SAMPLE_RATE", 0.0)
+    if not token and not sample_rate:
+        return None
+    profiler = RequestProfiler(
+        flask_app.wsgi_app,
+        flask_app.config["PROFILE_DIR"],
+        token=token,
+        sample_rate=sample_rate,
+        keep=flask_app.config.get("PROFILE_KEEP", 50),
+    )
+    flask_app.wsgi_app = profiler
+    flask_app.extensions["profiler"] = profiler
+    if token:
+        flask_app.add_url_rule(ADMIN_PATH, "list_profiles", list_profiles)
+        flask_app.add_url_rule(f"{ADMIN_PATH}/<name>", "get_profile", get_profile)
+    flask_app.logger.warning(
+        "Request profiling is on: %s, sample rate %s, saved in %s",
+        "token" if token else "no token",
+        sample_rate,
+        profiler.profile_dir,
+    )
+    return profiler
+
+
+######################################################################
+# Admin endpoints
+######################################################################
+def admin_profiler():
+    """Returns the profiler, aborts unless the request has the token"""
+    profiler = current_app.extensions["profiler"]
+    if not profiler.has_token(request.headers.get(TOKEN_HEADER)):
+        abort(status.HTTP_403_FORBIDDEN, f"A valid {TOKEN_HEADER} header is required")
+    return profiler
+
+
+def list_profiles():
+    """Lists the saved profiles, the newest first"""
+    profiler = admin_profiler()
+    results = []
+    for name in profiler.profiles():
+        try:
+            info = os.stat(os.path.join(profiler.profile_dir, name))
+        except FileNotFoundError:
+            continue
+        results.append(
+            {
+                "name": name,
+                "size": info.st_size,
+                "created": datetime.fromtimestamp(info.st_mtime, timezone.utc).isoformat(),
+                "url": url_for("get_profile", name=name, _external=True),
+            }
+        )
+    return jsonify(results), status.HTTP_200_OK
+
+
+def get_profile(name):
+    """Downloads a profile as a pstats file, or as text with ?format=text
+
+    The text is sorted by ?sort (cumulative by default) and shows the first
+    ?limit functions (50 by default) with the functions each of them called.
+    """
+    profiler = admin_profiler()
+    if name not in profiler.profiles():
+        abort(status.HTTP_404_NOT_FOUND, f"Profile {name} was not found")
+    if request.args.get("format") != "text":
+        return send_from_directory(
+            profiler.profile_dir, name, mimetype="application/octet-stream", as_attachment=True
+        )
+
+    sort = request.args.get("sort", "cumulative")
+    if sort not in pstats.Stats.sort_arg_dict_default:
+        abort(status.HTTP_400_BAD_REQUEST, f"Profiles cannot be sorted by {sort}")
+    limit = request.args.get("limit", 50, type=int)
+    stream = io.StringIO()
+    stats = pstats.Stats(os.path.join(profiler.profile_dir, name), stream=stream)
+    stats.sort_stats(sort).print_stats(limit)
+    stats.print_callees(limit)
+    return Response(stream.getvalue(), status=status.HTTP_200_OK, content_type="text/plain")
+
+
+init_profiling(app)
@@ -0,0 +1,42 @@
+"""
+Serializers
+
+This module turns Inventory rows read as plain tuples straight into JSON
+bytes, so large lists skip the ORM objects and the flask-restx marshaling.
+orjson is used when it is installed, otherwise the standard json module.
+"""
+import json
+from enum import Enum
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# the keys of Inventory.serialize(), in the order of the row columns
+FIELDS = ("pid", "condition", "name", "quantity", "restock_level", "active", "version")
+
+
+def enum_value(obj):
+    """Returns the value of an Enum for the standard json module"""
+    if isinstance(obj, Enum):
+        return obj.value
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(data) -> bytes:
+    """Encodes data as compact JSON bytes, Enums as their values"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), default=enum_value).encode("utf-8")
+
+
+def row_dicts(rows):
+    """Yields a serialized dict for every (pid, condition, ...) row"""
+    for row in rows:
+        yield dict(zip(FIELDS, row))
+
+
+def dumps_rows(rows) -> bytes:
+    """Encodes rows as a JSON list of serialized items"""
+    return dumps(list(row_dicts(rows)))
@@ -0,0 +1,80 @@
+"""
+Validation
+
+This module compiles a schema of fields into a validator that checks a
+single dict or a whole batch of them in one pass. A schema is a sequence
+of (name, check) pairs built with instance_of() and member_of(), and the
+fields are checked in that order so the first error of an item is always
+the same one.
+"""
+from enum import Enum
+
+
+def instance_of(kind, label):
+    """A check that the value is an instance of kind, reported as label"""
+    return ("instance", kind, label)
+
+
+def member_of(enum: type[Enum]):
+    """A check that the value is one of the values of enum, converted to its member"""
+    return ("member", enum, None)
+
+
+class Validator:
+    """Validates dicts against a compiled schema"""
+
+    def __init__(self, schema, error=ValueError):
+        self.error = error
+        # (name, kind, members, enum, label) for each field, in schema order
+        fields = []
+        for name, (check, kind, label) in schema:
+            if check == "instance":
+                fields.append((name, kind, None, None, label))
+            else:
+                # pylint: disable=protected-access
+                fields.append((name, None, kind._value2member_map_, kind, label))
+        self._fields = tuple(fields)
+
+    def _check(self, data):
+        """Returns the values of data or the message of its first error"""
+        values = {}
+        try:
+            for name, kind, members, enum, label in self._fields:
+                value = data[name]
+                if kind is not None:
+                    if not isinstance(value, kind):
+                        return None, f"Invalid type for {label} [{name}]: {type(value)}"
+                elif value in members:
+                    value = enum(value)
+                else:
+                    return None, f"Invalid {name}: {type(value)}"
+                values[name] = value
+        except KeyError as error:
+            return None, "Invalid item: missing " + error.args[0]
+        except TypeError as error:
+            return None, "Invalid item: body of request contained bad or no data " + str(error)
+        return values, None
+
+    def validate(self, data):
+        """Returns the validated values of a dict, raises error for the first problem"""
+        values, message = self._check(data)
+        if message is not None:
+            raise self.error(message)
+        return values
+
+    def validate_many(self, items):
+        """Validates a list of dicts in one pass
+
+        Returns the (index, values) of the valid items and the
+        (index, message) of every invalid one.
+        """
+        valid = []
+        errors = []
+        check = self._check
+        for index, data in enumerate(items):
+            values, message = check(data)
+            if message is None:
+                valid.append((index, values))
+            else:
+                errors.append((index, message))
+        return valid, errors
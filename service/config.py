@@ -2,6 +2,8 @@
 Global Configuration for Application
 """
 import os
+import tempfile
+from service.common.pool import engine_options
 
 # Get configuration from environment
 DATABASE_URI = os.getenv(
@@ -12,5 +14,48 @@ DATABASE_URI = os.getenv(
 SQLALCHEMY_DATABASE_URI = DATABASE_URI
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+# Connection pool of each worker process, the sizes do not apply to SQLite
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("true", "yes", "1")
+SQLALCHEMY_ENGINE_OPTIONS = engine_options(
+    DATABASE_URI,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+)
+
+# Cache of serialized items for point lookups, per worker process
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "1024"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))
+
+# Seconds the stock summary is reused before it is aggregated again
+SUMMARY_TTL = float(os.getenv("SUMMARY_TTL", "5"))
+
+# Threads that run the Flask requests of the ASGI app (service.asgi)
+ASGI_WSGI_WORKERS = int(os.getenv("ASGI_WSGI_WORKERS", "10"))
+
+# Statements slower than this many milliseconds are logged, 0 turns the log off
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+# Seconds the database check of the readiness probe is reused
+READINESS_TTL = float(os.getenv("READINESS_TTL", "5"))
+
+# Seconds the connection pool may stay exhausted before the readiness
+# probe fails, so a burst of load does not take every replica out at once
+READINESS_SATURATION_GRACE = float(os.getenv("READINESS_SATURATION_GRACE", "30"))
+
+# Opt-in request profiling (service.common.profiling): requests sending
+# the token in X-Profile-Token, and this fraction of all requests, are
+# profiled. Both unset turns profiling off.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN") or None
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "inventory-profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
 # Secret for session management
 SECRET_KEY = os.getenv("SECRET_KEY", "s3cr3t-key-shhhh")
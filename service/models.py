@@ -1,18 +1,61 @@
 """ Inventory Models """
 import logging
+import sys
+import time
 from enum import Enum
 from flask_sqlalchemy import SQLAlchemy
+import sqlalchemy
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.sql.elements import Grouping
+from sqlalchemy.orm.exc import StaleDataError
+from service.common.cache import LRUCache
+from service.common.validation import Validator, instance_of, member_of
 
 logger = logging.getLogger("flask.app")
 
 db = SQLAlchemy()
 
+# the number of keys sent in a single IN (...) lookup
+BATCH_SIZE = 500
+
+# the largest value of an Integer column, 32 bit on PostgreSQL
+MAX_INTEGER = 2**31 - 1
+
+# the columns a list of Inventory items can be sorted by
+SORT_FIELDS = ("pid", "condition", "name", "quantity", "restock_level", "active")
+
+
+def new_version():
+    """Returns the first version of a new row, the microseconds since the epoch
+
+    An item that is deleted and created again must not reuse a version of
+    its earlier incarnation, or a stale ETag in If-None-Match or If-Match
+    would match the new row. A version only grows by one per committed
+    statement, far slower than the clock, so each incarnation starts above
+    every version of the ones before it.
+    """
+    return time.time_ns() // 1000
+
+
+def next_version(version):
+    """Returns the version of a row after a change, or the first one of a new row"""
+    return new_version() if version is None else version + 1
+
 
 def init_db(app):
     """Initialize the SQLAlchemy app"""
     Inventory.init_db(app)
 
 
+def init_app(app):
+    """Configures the SQLAlchemy app without connecting to the database"""
+    Inventory.init_app(app)
+
+
 class DataValidationError(Exception):
     """Used for an data validation errors when deserializing"""
 
@@ -25,10 +68,84 @@ class Condition(Enum):
     OPEN_BOX = 2
 
 
+# the fields a client sends for an Inventory item, checked in this order
+VALIDATOR = Validator(
+    (
+        ("pid", instance_of(int, "int")),
+        ("condition", member_of(Condition)),
+        ("name", instance_of(str, "str")),
+        ("quantity", instance_of(int, "int")),
+        ("restock_level", instance_of(int, "int")),
+        ("active", instance_of(bool, "bool")),
+    ),
+    error=DataValidationError,
+)
+
+# the key of an Inventory item in the lists of the batch actions
+KEY_VALIDATOR = Validator(
+    (
+        ("pid", instance_of(int, "int")),
+        ("condition", member_of(Condition)),
+    ),
+    error=DataValidationError,
+)
+
+
+class starts_with(FunctionElement):  # pylint: disable=invalid-name,too-many-ancestors
+    """column starts with prefix, as the range column >= prefix AND column < prefix_end(prefix)
+
+    LIKE 'prefix%' cannot use the name index on SQLite, where LIKE ignores
+    case, and a range can. Both bounds compare code points on every database.
+    """
+
+    # no Boolean type, or SQLite would compare the whole range to 1
+    type = sqlalchemy.types.NullType()
+    name = "starts_with"
+    inherit_cache = True
+
+    def __init__(self, column, prefix):
+        end = prefix_end(prefix)
+        super().__init__(column, prefix, *([] if end is None else [end]))
+
+
+@compiles(starts_with)
+def compile_starts_with(element, compiler, **kw):
+    """Compiles starts_with with the comparison operators, which use the C collation of SQLite"""
+    return range_sql(element, compiler, ">=", "<", **kw)
+
+
+@compiles(starts_with, "postgresql")
+def compile_starts_with_postgresql(element, compiler, **kw):
+    """Compiles starts_with with the code point operators of the text_pattern_ops name index"""
+    return range_sql(element, compiler, "~>=~", "~<~", **kw)
+
+
+def range_sql(element, compiler, lower, upper, **kw):
+    """Returns the SQL of a starts_with with the given comparison operators"""
+    column, *bounds = [compiler.process(clause, **kw) for clause in element.clauses]
+    conditions = [f"{column} {lower} {bounds[0]}"]
+    if len(bounds) > 1:
+        conditions.append(f"{column} {upper} {bounds[1]}")
+    return f"({' AND '.join(conditions)})"
+
+
+def prefix_end(prefix):
+    """Returns the smallest string after every string that starts with prefix, None if there is none"""
+    prefix = prefix.rstrip(chr(sys.maxunicode))
+    if not prefix:
+        return None
+    code = ord(prefix[-1]) + 1
+    # surrogates cannot be encoded, the next character is after them
+    return prefix[:-1] + chr(0xE000 if 0xD800 <= code <= 0xDFFF else code)
+
+
 class Inventory(db.Model):
     """Class that represents a Inventory"""
 
     app = None
+    cache = LRUCache()
+    # holds the latest stock summary, it is only refreshed when it expires
+    summary_cache = LRUCache(maxsize=1, ttl=5.0)
 
     pid = db.Column(db.Integer, primary_key=True)
     condition = db.Column(db.Enum(Condition), primary_key=True)
@@ -36,6 +153,35 @@ class Inventory(db.Model):
     quantity = db.Column(db.Integer)
     restock_level = db.Column(db.Integer)
     active = db.Column(db.Boolean)
+    # starts from the clock and is bumped on every change, it is the ETag of the item
+    version = db.Column(db.BigInteger, nullable=False, default=new_version, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version, "version_id_generator": next_version}
+
+    # pid is the trailing column so filtered pages come back in key order
+    __table_args__ = (
+        db.Index("ix_inventory_condition", condition, pid),
+        db.Index("ix_inventory_active", active, pid),
+        db.Index(
+            "ix_inventory_name", name, postgresql_ops={"name": "text_pattern_ops"}
+        ),
+        db.Index(
+            "ix_inventory_active_rows",
+            pid,
+            condition,
+            postgresql_where=active == db.true(),
+            sqlite_where=active == db.true(),
+        ),
+        # the low stock report, largest deficit first
+        db.Index(
+            "ix_inventory_low_stock",
+            Grouping(restock_level - quantity).desc(),
+            pid,
+            condition,
+            postgresql_where=db.and_(active == db.true(), quantity < restock_level),
+            sqlite_where=db.and_(active == db.true(), quantity < restock_level),
+        ),
+    )
 
     def __init__(
         self,
@@ -61,6 +207,7 @@ class Inventory(db.Model):
 
         db.session.add(self)
         db.session.commit()
+        Inventory.cache.invalidate((self.pid, self.condition))
 
     def update(self):
         """Updates an Inventory Item in the database"""
@@ -68,12 +215,32 @@ class Inventory(db.Model):
             raise DataValidationError("pid must be provided")
         if self.condition is None:
             raise DataValidationError("condition must be provided")
-        db.session.commit()
+        # the key may have been changed, so forget the one it was loaded with too
+        original_key = sqlalchemy.inspect(self).identity
+        try:
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            raise
+        Inventory.cache.invalidate(original_key, (self.pid, self.condition))
 
     def delete(self):
         """Removes a Inventory item from database"""
+        key = (self.pid, self.condition)
         db.session.delete(self)
         db.session.commit()
+        Inventory.cache.invalidate(key)
+
+    def as_row(self):
+        """Returns the column values of an Inventory item for a Core insert"""
+        return {
+            "pid": self.pid,
+            "condition": self.condition,
+            "name": self.name,
+            "quantity": self.quantity,
+            "restock_level": self.restock_level,
+            "active": self.active,
+        }
 
     def serialize(self):
         """Serializes an Inventory item into a dictionary"""
@@ -84,64 +251,13 @@ class Inventory(db.Model):
             "quantity": self.quantity,
             "restock_level": self.restock_level,
             "active": self.active,
+            "version": self.version,
         }
 
     def deserialize(self, data: dict):
         """Creates an Inventory item from a dictionary"""
-        try:
-            if isinstance(data["pid"], int):
-                self.pid = data["pid"]
-            else:
-                raise DataValidationError(
-                    "Invalid type for int [pid]: " + str(type(data["pid"]))
-                )
-
-            # pylint: disable=protected-access
-            if data["condition"] in Condition._value2member_map_:
-                self.condition = Condition(data["condition"])
-            else:
-                raise DataValidationError(
-                    "Invalid condition: " + str(type(data["condition"]))
-                )
-
-            if isinstance(data["name"], str):
-                self.name = data["name"]
-            else:
-                raise DataValidationError(
-                    "Invalid type for str [name]: " + str(type(data["name"]))
-                )
-
-            if isinstance(data["quantity"], int):
-                self.quantity = data["quantity"]
-            else:
-                raise DataValidationError(
-                    "Invalid type for int [quantity]: " + str(type(data["quantity"]))
-                )
-
-            if isinstance(data["restock_level"], int):
-                self.restock_level = data["restock_level"]
-            else:
-                raise DataValidationError(
-                    "Invalid type for int [restock_level]: "
-                    + str(type(data["restock_level"]))
-                )
-
-            if isinstance(data["active"], bool):
-                self.active = data["active"]
-            else:
-                raise DataValidationError(
-                    "Invalid type for bool [active]: " + str(type(data["active"]))
-                )
-
-        except KeyError as error:
-            raise DataValidationError(
-                "Invalid item: missing " + error.args[0]
-            ) from error
-        except TypeError as error:
-            raise DataValidationError(
-                "Invalid item: body of request contained bad or no data " + str(error)
-            ) from error
-
+        for name, value in VALIDATOR.validate(data).items():
+            setattr(self, name, value)
         return self
 
     def activate(self):
@@ -153,57 +269,371 @@ class Inventory(db.Model):
         self.active = False
 
     @classmethod
-    def init_db(cls, app):
-        """Initializes the database session"""
+    def init_app(cls, app):
+        """Configures the caches and the database session
+
+        Nothing connects to the database until the first query, so a
+        worker can start serving before the database is up.
+        """
         cls.app = app
+        cls.cache = LRUCache(
+            app.config.get("CACHE_MAXSIZE", 1024), app.config.get("CACHE_TTL", 30.0)
+        )
+        cls.summary_cache = LRUCache(maxsize=1, ttl=app.config.get("SUMMARY_TTL", 5.0))
         db.init_app(app)
+
+    @classmethod
+    def init_db(cls, app):
+        """Initializes the database session and creates the tables"""
+        cls.init_app(app)
         app.app_context().push()
         db.create_all()
 
+    @classmethod
+    def bulk_insert(cls, rows):
+        """Inserts many rows of column values with one executemany and one commit"""
+        try:
+            if rows:
+                db.session.execute(cls.__table__.insert(), rows)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            raise
+        cls.cache.invalidate(*((row["pid"], row["condition"]) for row in rows))
+
+    @classmethod
+    def validate_many(cls, items):
+        """Validates a list of dictionaries in one pass
+
+        Returns the (index, column values) of the valid items and the
+        (index, message) of every invalid one, with the messages of deserialize.
+        """
+        return VALIDATOR.validate_many(items)
+
+    @classmethod
+    def update_if_version(cls, pid, item, version):
+        """Writes the values of item over a row only if the row is still at version
+
+        This is a single UPDATE ... WHERE version = :version, so no row lock
+        is held between reading and writing. Returns False if the row is
+        missing or was changed since.
+        """
+        values = item.as_row()
+        values["version"] = cls.version + 1
+        count = cls.query.filter(
+            cls.pid == parse_pid(pid),
+            cls.condition == item.condition,
+            cls.version == version,
+        ).update(values, synchronize_session=False)
+        db.session.commit()
+        if count:
+            cls.cache.invalidate((parse_pid(pid), item.condition), (item.pid, item.condition))
+        return count == 1
+
+    @classmethod
+    def adjust_quantity(cls, pid, condition_value, delta):
+        """Adds delta to the quantity of an item in one UPDATE that never goes below zero
+
+        On databases with RETURNING the new row comes back from the same
+        statement. Returns the serialized item, or None if the item does not
+        exist, has less than -delta in stock or would hold more than
+        MAX_INTEGER. The bounds are compared without adding to the column,
+        so the statement itself cannot overflow.
+        """
+        pid = parse_pid(pid)
+        condition = parse_condition(condition_value)
+        if not isinstance(delta, int) or isinstance(delta, bool):
+            raise DataValidationError(f"Invalid type for int [delta]: {type(delta)}")
+        if not -MAX_INTEGER <= delta <= MAX_INTEGER:
+            raise DataValidationError(f"Delta {delta} is invalid: must be between {-MAX_INTEGER} and {MAX_INTEGER}")
+
+        table = cls.__table__
+        statement = (
+            table.update()
+            .where(
+                table.c.pid == pid,
+                table.c.condition == condition,
+                table.c.quantity >= -delta,
+                table.c.quantity <= MAX_INTEGER - delta,
+            )
+            .values(quantity=table.c.quantity + delta, version=table.c.version + 1)
+        )
+        if db.engine.dialect.full_returning:
+            row = db.session.execute(statement.returning(*table.c)).first()
+        else:
+            result = db.session.execute(statement)
+            row = None
+            if result.rowcount:
+                row = db.session.execute(
+                    table.select().where(table.c.pid == pid, table.c.condition == condition)
+                ).first()
+        db.session.commit()
+
+        if row is None:
+            return None
+        cls.cache.invalidate((pid, condition))
+        data = dict(row._mapping)  # pylint: disable=protected-access
+        data["condition"] = data["condition"].value
+        return data
+
+    @classmethod
+    def validate_keys(cls, items):
+        """Validates a list of {"pid", "condition"} dicts in one pass
+
+        Returns the (pid, Condition) keys of the valid items and the
+        (index, message) of every invalid one.
+        """
+        valid, errors = KEY_VALIDATOR.validate_many(items)
+        return [(values["pid"], values["condition"]) for _, values in valid], errors
+
+    @classmethod
+    def set_active(cls, active, keys=None, criteria=None):
+        """Sets the active flag of many items with set-based UPDATEs and one commit
+
+        The items are either the (pid, condition) keys, sent BATCH_SIZE at a
+        time, or every item matching the WHERE criteria of filter_criteria.
+        Only the items whose flag changes are written and get a new version.
+        Returns how many items changed.
+        """
+        table = cls.__table__
+        statement = (
+            table.update()
+            .where(table.c.active != active)
+            .values(active=active, version=table.c.version + 1)
+        )
+        count = 0
+        if keys is not None:
+            # a fixed order makes concurrent batches lock their rows in the same order
+            keys = sorted(set(keys), key=lambda key: (key[0], key[1].value))
+            key_columns = sqlalchemy.tuple_(table.c.pid, table.c.condition)
+            for start in range(0, len(keys), BATCH_SIZE):
+                chunk = keys[start:start + BATCH_SIZE]
+                count += db.session.execute(statement.where(key_columns.in_(chunk))).rowcount
+        else:
+            count = db.session.execute(statement.where(*criteria)).rowcount
+        db.session.commit()
+        if count:
+            if keys is not None:
+                cls.cache.invalidate(*keys)
+            else:
+                cls.cache.clear()
+        return count
+
+    @classmethod
+    def find_existing_keys(cls, keys):
+        """Returns which of the (pid, condition) keys are already in the database"""
+        keys = set(keys)
+        pids = sorted({pid for pid, _ in keys})
+        existing = set()
+        for start in range(0, len(pids), BATCH_SIZE):
+            rows = db.session.query(cls.pid, cls.condition).filter(
+                cls.pid.in_(pids[start:start + BATCH_SIZE])
+            )
+            existing.update((row.pid, row.condition) for row in rows)
+        return existing & keys
+
     @classmethod
     def all(cls):
         """Returns all of the Inventory items in the database"""
         return cls.query.all()
 
     @classmethod
-    def find_by_pid_condition(cls, pid, condition_value):
-        """Finds a Inventory by it's PID and condition"""
+    def select_rows(cls, *criteria):
+        """Returns a Core select of plain rows in the field order of serialize()
+
+        Read only requests run it instead of loading Inventory objects, so
+        no identity map or session state is built for rows that are only
+        serialized. The rows are named tuples: row.pid, row.condition, ...
+        """
+        columns = cls.__table__.c
+        return sqlalchemy.select(
+            columns.pid,
+            columns.condition,
+            columns.name,
+            columns.quantity,
+            columns.restock_level,
+            columns.active,
+            columns.version,
+        ).where(*criteria)
 
-        try:
-            condition = Condition(int(condition_value))
-        except ValueError as error:
-            raise DataValidationError(
-                f"Condition {condition_value} is invalid :" + str(error)
-            ) from error
+    @classmethod
+    def read_rows(cls, statement):
+        """Runs a select of select_rows and returns all of its rows"""
+        return db.session.execute(statement).all()
 
-        try:
-            pid = int(pid)
-        except ValueError as error:
-            raise DataValidationError(f"PID {pid} is invalid :" + str(error)) from error
+    @classmethod
+    def stream_rows(cls, statement, batch_size):
+        """Runs a select of select_rows and yields its rows batch_size at a time"""
+        result = db.session.execute(statement, execution_options={"stream_results": True})
+        return result.yield_per(batch_size)
+
+    @classmethod
+    def find_row_page(cls, statement, limit, after=None):
+        """Returns up to limit rows of a select of select_rows ordered by (pid, condition)
+
+        The page starts right after the (pid, condition) key given in after.
+        """
+        return cls.read_rows(cls.page_select(statement, limit, after))
+
+    @classmethod
+    def page_select(cls, statement, limit, after=None):
+        """Limits a select of select_rows to the page after a (pid, condition) key"""
+        columns = cls.__table__.c
+        if after is not None:
+            statement = statement.where(*cls.after_key(after))
+        return statement.order_by(columns.pid, columns.condition).limit(limit)
+
+    @classmethod
+    def after_key(cls, after):
+        """Returns the criteria of the rows after a (pid, condition) key"""
+        columns = cls.__table__.c
+        pid, condition = after
+        # the redundant pid >= bound lets the planner seek into the key index
+        return (columns.pid >= pid, or_(columns.pid > pid, columns.condition > condition))
 
+    @classmethod
+    def find_low_stock(cls, limit, after=None):
+        """Returns up to limit rows of active items below their restock level, largest deficit first
+
+        The filter and order match ix_inventory_low_stock, and a page starts
+        right after the (deficit, pid, condition) key given in after.
+        """
+        columns = cls.__table__.c
+        deficit = columns.restock_level - columns.quantity
+        statement = cls.low_stock_select()
+        if after is not None:
+            after_deficit, pid, condition = after
+            statement = statement.where(
+                deficit <= after_deficit,
+                or_(
+                    deficit < after_deficit,
+                    columns.pid > pid,
+                    and_(columns.pid == pid, columns.condition > condition),
+                ),
+            )
+        return cls.read_rows(statement.limit(limit))
+
+    @classmethod
+    def low_stock_select(cls):
+        """Returns the select of active items below their restock level in report order"""
+        columns = cls.__table__.c
+        deficit = columns.restock_level - columns.quantity
+        return cls.select_rows(
+            columns.active == db.true(), columns.quantity < columns.restock_level
+        ).order_by(deficit.desc(), columns.pid, columns.condition)
+
+    @classmethod
+    def summary(cls):
+        """Returns the number of items and units per condition and active flag
+
+        The totals are aggregated by the database in one GROUP BY and are
+        reused until summary_cache expires, so they may be a few seconds old.
+        """
+        data = cls.summary_cache.get("summary")
+        if data is not None:
+            return data
+
+        rows = (
+            db.session.query(
+                cls.condition,
+                cls.active,
+                sqlalchemy.func.count(),
+                sqlalchemy.func.coalesce(sqlalchemy.func.sum(cls.quantity), 0),
+            )
+            .group_by(cls.condition, cls.active)
+            .all()
+        )
+        by_condition = {condition: [0, 0] for condition in Condition}
+        by_active = {True: [0, 0], False: [0, 0]}
+        groups = []
+        for condition, active, items, quantity in rows:
+            active = bool(active)
+            for totals in (by_condition[condition], by_active[active]):
+                totals[0] += items
+                totals[1] += quantity
+            groups.append(
+                {
+                    "condition": condition.value,
+                    "active": active,
+                    "items": items,
+                    "quantity": quantity,
+                }
+            )
+        data = {
+            "items": sum(totals[0] for totals in by_condition.values()),
+            "quantity": sum(totals[1] for totals in by_condition.values()),
+            "conditions": [
+                {"condition": condition.value, "items": items, "quantity": quantity}
+                for condition, (items, quantity) in by_condition.items()
+            ],
+            "active": [
+                {"active": active, "items": items, "quantity": quantity}
+                for active, (items, quantity) in by_active.items()
+            ],
+            "groups": sorted(groups, key=lambda group: (group["condition"], group["active"])),
+        }
+        cls.summary_cache.set("summary", data)
+        return data
+
+    @classmethod
+    def find_by_pid_condition(cls, pid, condition_value):
+        """Finds a Inventory by it's PID and condition"""
+        condition = parse_condition(condition_value)
+        pid = parse_pid(pid)
         result = cls.query.filter(cls.pid == pid, cls.condition == condition).first()
         return result
 
+    @classmethod
+    def find_serialized(cls, pid, condition_value):
+        """Returns a serialized Inventory item by it's PID and condition
+
+        Hot items are served from the in-process cache without a query.
+        """
+        key = (parse_pid(pid), parse_condition(condition_value))
+        data = cls.cache.get(key)
+        if data is None:
+            generation = cls.cache.generation
+            columns = cls.__table__.c
+            statement = cls.select_rows(columns.pid == key[0], columns.condition == key[1])
+            row = db.session.execute(statement).first()
+            if row is None:
+                return None
+            data = serialize_row(row)
+            cls.cache.set(key, data, generation)
+        return dict(data)
+
+    @classmethod
+    def find_version(cls, pid, condition_value):
+        """Returns only the version of an Inventory item, or None if it does not exist"""
+        key = (parse_pid(pid), parse_condition(condition_value))
+        data = cls.cache.get(key)
+        if data is not None:
+            return data["version"]
+        return (
+            db.session.query(cls.version)
+            .filter(cls.pid == key[0], cls.condition == key[1])
+            .scalar()
+        )
+
+    @classmethod
+    def find_versions(cls, pid):
+        """Returns the (condition, version) of every Inventory item with a PID"""
+        return (
+            db.session.query(cls.condition, cls.version)
+            .filter(cls.pid == parse_pid(pid))
+            .order_by(cls.condition)
+            .all()
+        )
+
     @classmethod
     def find_by_pid(cls, pid):
         """Finds a Inventory item by it's PID"""
-        try:
-            pid = int(pid)
-        except ValueError as error:
-            raise DataValidationError(f"PID {pid} is invalid :" + str(error)) from error
-        return cls.query.filter(cls.pid == pid)
+        return cls.query.filter(cls.pid == parse_pid(pid))
 
     @classmethod
     def find_by_condition(cls, condition_value):
         """Finds a Inventory item by it's Condition"""
-        try:
-            condition = Condition(int(condition_value))
-        except ValueError as error:
-            raise DataValidationError(
-                f"Condition {condition_value} is invalid :" + str(error)
-            ) from error
-
-        return cls.query.filter(cls.condition == condition)
+        return cls.query.filter(cls.condition == parse_condition(condition_value))
 
     @classmethod
     def find_by_active(cls, active):
@@ -213,3 +643,240 @@ class Inventory(db.Model):
 
         else:
             raise DataValidationError(f"Active {active} is invalid")
+
+    @classmethod
+    def find_by_name(cls, name):
+        """Finds a Inventory item by it's Name"""
+        return cls.query.filter(cls.name == name)
+
+    @classmethod
+    def filter_criteria(
+        cls,
+        pid=None,
+        condition=None,
+        active=None,
+        name=None,
+        min_quantity=None,
+        max_quantity=None,
+    ):  # pylint: disable=too-many-arguments
+        """Returns the WHERE criteria of every filter that is given
+
+        name matches as a prefix and the quantity bounds are inclusive. The
+        criteria use the table columns, so they work in ORM queries and in
+        the Core selects of select_rows alike.
+        """
+        columns = cls.__table__.c
+        criteria = []
+        if pid is not None:
+            criteria.append(columns.pid == parse_pid(pid))
+        if condition is not None:
+            criteria.append(columns.condition == parse_condition(condition))
+        if active is not None:
+            if not isinstance(active, bool):
+                raise DataValidationError(f"Active {active} is invalid")
+            criteria.append(columns.active == active)
+        if name is not None:
+            criteria.append(starts_with(columns.name, name))
+        if min_quantity is not None:
+            criteria.append(columns.quantity >= parse_int("min_quantity", min_quantity))
+        if max_quantity is not None:
+            criteria.append(columns.quantity <= parse_int("max_quantity", max_quantity))
+        return criteria
+
+    @classmethod
+    def find_by_filters(cls, sort=None, **filters):
+        """Builds one query for every filter that is given, combined with AND
+
+        The filters are those of filter_criteria and sort is a comma
+        separated list of columns, each optionally prefixed by - for
+        descending order.
+        """
+        query = cls.query.filter(*cls.filter_criteria(**filters))
+        if sort is not None:
+            query = query.order_by(*parse_sort(sort))
+        return query
+
+    @classmethod
+    def delete_matching(cls, query):
+        """Removes every Inventory item matched by a query with one DELETE"""
+        count = query.delete(synchronize_session=False)
+        db.session.commit()
+        cls.cache.clear()
+        return count
+
+
+def create_schema(engine):
+    """Creates the missing tables, then any missing, narrow column and missing index of Inventory
+
+    Returns the names of the added columns, of the widened columns and of
+    the created indexes.
+    """
+    db.Model.metadata.create_all(bind=engine)
+    return add_missing_columns(engine), widen_columns(engine), create_indexes(engine)
+
+
+def widen_columns(engine):
+    """Changes the INTEGER columns the model declares as BIGINT, keeping every row
+
+    Only PostgreSQL is altered, SQLite stores 64 bit values in any INTEGER column.
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+    table = Inventory.__table__
+    existing = {
+        column["name"]: column["type"]
+        for column in sqlalchemy.inspect(engine).get_columns(table.name)
+    }
+    widened = []
+    with engine.begin() as connection:
+        for column in table.columns:
+            current = existing.get(column.name)
+            if (
+                isinstance(column.type, sqlalchemy.BigInteger)
+                and current is not None
+                and not isinstance(current, sqlalchemy.BigInteger)
+            ):
+                connection.execute(
+                    sqlalchemy.text(f"ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE BIGINT")
+                )
+                widened.append(column.name)
+    return widened
+
+
+def add_missing_columns(engine):
+    """Adds any Inventory column that is missing from an existing database
+
+    Only columns with a server default can be added to a table with rows.
+    """
+    table = Inventory.__table__
+    existing = {
+        column["name"] for column in sqlalchemy.inspect(engine).get_columns(table.name)
+    }
+    added = []
+    with engine.begin() as connection:
+        for column in table.columns:
+            if column.name in existing or column.server_default is None:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            null = "NULL" if column.nullable else "NOT NULL"
+            connection.execute(
+                sqlalchemy.text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} "
+                    f"{column_type} {null} DEFAULT {column.server_default.arg}"
+                )
+            )
+            added.append(column.name)
+    return added
+
+
+def index_names(engine, table_name):
+    """Returns the names of the indexes on a table
+
+    The catalogs are read directly because reflection skips expression indexes.
+    """
+    catalogs = {
+        "sqlite": "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table",
+        "postgresql": "SELECT indexname FROM pg_indexes WHERE tablename = :table",
+    }
+    if engine.dialect.name not in catalogs:
+        return {index["name"] for index in sqlalchemy.inspect(engine).get_indexes(table_name)}
+    with engine.connect() as connection:
+        rows = connection.execute(
+            sqlalchemy.text(catalogs[engine.dialect.name]), {"table": table_name}
+        )
+        return {row[0] for row in rows}
+
+
+def create_indexes(engine):
+    """Creates any Inventory index that is missing from an existing database
+
+    On PostgreSQL the indexes are built CONCURRENTLY, so the running
+    service keeps writing to the table while a deploy adds them.
+    """
+    existing = index_names(engine, Inventory.__tablename__)
+    created = []
+    for index in sorted(Inventory.__table__.indexes, key=lambda index: index.name):
+        if index.name not in existing:
+            if engine.dialect.name == "postgresql":
+                create_index_concurrently(engine, index)
+            else:
+                index.create(bind=engine)
+            created.append(index.name)
+    if created:
+        # refresh the planner statistics so the new (partial) indexes are chosen
+        with engine.begin() as connection:
+            connection.execute(sqlalchemy.text(f"ANALYZE {Inventory.__tablename__}"))
+    return created
+
+
+def create_index_concurrently(engine, index):
+    """Builds an index with CREATE INDEX CONCURRENTLY, which does not block writes
+
+    The statement cannot run in a transaction. A build that fails leaves an
+    invalid index behind, so it is dropped to be built again on the next run.
+    """
+    statement = str(CreateIndex(index).compile(dialect=engine.dialect))
+    statement = statement.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        try:
+            connection.exec_driver_sql(statement)
+        except DBAPIError:
+            connection.exec_driver_sql(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}")
+            raise
+
+
+def serialize_row(row):
+    """Serializes a row of Inventory.select_rows() like Inventory.serialize()"""
+    # unpacking is much cheaper than looking each column up by name
+    pid, condition, name, quantity, restock_level, active, version = row
+    return {
+        "pid": pid,
+        "condition": condition.value,
+        "name": name,
+        "quantity": quantity,
+        "restock_level": restock_level,
+        "active": active,
+        "version": version,
+    }
+
+
+def parse_pid(pid):
+    """Converts a PID from a request into an int"""
+    try:
+        return int(pid)
+    except ValueError as error:
+        raise DataValidationError(f"PID {pid} is invalid :" + str(error)) from error
+
+
+def parse_int(field, value):
+    """Converts an integer filter from a request into an int"""
+    try:
+        return int(value)
+    except ValueError as error:
+        raise DataValidationError(f"{field} {value} is invalid :" + str(error)) from error
+
+
+def parse_sort(sort):
+    """Converts a sort specification like "-quantity,name" into ORDER BY columns
+
+    The primary key is always appended so the order is deterministic.
+    """
+    columns = []
+    for field in sort.split(","):
+        descending = field.startswith("-")
+        field = field.lstrip("-")
+        if field not in SORT_FIELDS:
+            raise DataValidationError(f"Cannot sort by {field or 'nothing'}")
+        column = Inventory.__table__.c[field]
+        columns.append(column.desc() if descending else column.asc())
+    return columns + [Inventory.__table__.c.pid, Inventory.__table__.c.condition]
+
+
+def parse_condition(condition_value):
+    """Converts a condition value from a request into a Condition"""
+    try:
+        return Condition(int(condition_value))
+    except ValueError as error:
+        raise DataValidationError(
+            f"Condition {condition_value} is invalid :" + str(error)
+        ) from error
@@ -1,9 +1,20 @@
 """ Inventory Routes """
 
-from flask import jsonify, request, abort, url_for
-from flask_restx import Api, Resource, fields, reqparse, inputs
-from service.models import Inventory, Condition
-from .common import status
+import hashlib
+import time
+from flask import Response, jsonify, request, abort, url_for, stream_with_context
+from flask_restx import Api, Resource, fields, reqparse, inputs, marshal
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
+from werkzeug.http import quote_etag
+from service.models import (
+    db, Inventory, Condition, DataValidationError, parse_sort, serialize_row
+)
+from .common import serializers, status
+from .common.cache import LRUCache
+from .common.pool import pool_stats
+from .common.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor, parse_limit
 
 from . import app
 
@@ -58,17 +69,131 @@ inventory_model = api.inherit(
         'pid': fields.Integer(
             readOnly=True, description='The unique id assigned internally by service'
         ),
+        'version': fields.Integer(
+            readOnly=True, description='The version of the item, bumped on every change'
+        ),
+    },
+)
+
+batch_result_model = api.model(
+    'BatchResult',
+    {
+        'index': fields.Integer(description='The position of the item in the posted list'),
+        'pid': fields.Integer(description='The PID of the item, if it could be read'),
+        'condition': fields.Integer(description='The condition of the item, if it could be read'),
+        'status': fields.Integer(description='The HTTP status for this item [201 | 400 | 409]'),
+        'error': fields.String(description='Why the item was not created'),
+    }
+)
+
+delete_result_model = api.model(
+    'DeleteResult',
+    {
+        'deleted': fields.Integer(description='The number of Inventory items deleted'),
+    }
+)
+
+update_result_model = api.model(
+    'UpdateResult',
+    {
+        'updated': fields.Integer(description='The number of Inventory items changed'),
+    }
+)
+
+key_model = api.model(
+    'InventoryKey',
+    {
+        'pid': fields.Integer(required=True, description='The PID of the item'),
+        'condition': fields.Integer(required=True, description='The type of inventory [NEW | OPEN | USED]'),
+    }
+)
+
+low_stock_model = api.inherit(
+    'LowStockModel',
+    inventory_model,
+    {
+        'deficit': fields.Integer(
+            readOnly=True, description='How many units are missing to reach the restock level'
+        ),
     },
 )
 
+summary_total_fields = {
+    'items': fields.Integer(description='The number of Inventory items'),
+    'quantity': fields.Integer(description='The total quantity of the Inventory items'),
+}
+
+summary_model = api.model(
+    'Summary',
+    {
+        **summary_total_fields,
+        'conditions': fields.List(fields.Nested(api.model(
+            'ConditionSummary',
+            {'condition': fields.Integer(description='The type of inventory [NEW | OPEN | USED]'),
+             **summary_total_fields},
+        ))),
+        'active': fields.List(fields.Nested(api.model(
+            'ActiveSummary',
+            {'active': fields.Boolean(description='Is the inventory active?'),
+             **summary_total_fields},
+        ))),
+        'groups': fields.List(fields.Nested(api.model(
+            'GroupSummary',
+            {'condition': fields.Integer(description='The type of inventory [NEW | OPEN | USED]'),
+             'active': fields.Boolean(description='Is the inventory active?'),
+             **summary_total_fields},
+        ))),
+    }
+)
+
+adjust_model = api.model(
+    'Adjustment',
+    {
+        'delta': fields.Integer(
+            required=True, description='The signed amount to add to the quantity'
+        ),
+    }
+)
+
+# media type of the streaming list responses, one JSON item per line
+NDJSON = 'application/x-ndjson'
+
+# the number of rows fetched from the database cursor at a time when streaming
+STREAM_BATCH_SIZE = 1000
+
+# the largest number of items accepted by a single batch request
+MAX_BATCH_SIZE = 100000
+
+# the query string arguments that filter the list, besides active
+FILTER_FIELDS = ("pid", "condition", "name", "min_quantity", "max_quantity")
+
 # query string arguments
 # --------------------------------------------------------------------------------------------------
 inventory_args = reqparse.RequestParser()
-inventory_args.add_argument('condition', type=int, required=True, location='args', help='The type of inventory [NEW | OPEN | USED]')
-inventory_args.add_argument('name', type=str, required=False, location='args', help='The name of Inventory')
-inventory_args.add_argument('quantity', type=int, required=False, location='args', help='The quantity of the Inventory')
-inventory_args.add_argument('restock_level', type=int, required=False, location='args', help='The restock level of the inventory')
-inventory_args.add_argument('active', type=inputs.boolean, required=False, location='args', help='List inventorys by active status')
+inventory_args.add_argument('pid', type=int, required=False, location='args',
+                            help='List inventory with this PID')
+inventory_args.add_argument('condition', type=int, required=False, location='args',
+                            help='The type of inventory [NEW | OPEN | USED]')
+inventory_args.add_argument('name', type=str, required=False, location='args',
+                            help='List inventory whose name starts with this prefix')
+inventory_args.add_argument('min_quantity', type=int, required=False, location='args',
+                            help='List inventory with at least this quantity')
+inventory_args.add_argument('max_quantity', type=int, required=False, location='args',
+                            help='List inventory with at most this quantity')
+inventory_args.add_argument('active', type=inputs.boolean, required=False, location='args',
+                            help='List inventorys by active status')
+inventory_args.add_argument('sort', type=str, required=False, location='args',
+                            help='Comma separated fields to sort by, prefix with - for descending')
+inventory_args.add_argument('limit', type=int, required=False, location='args',
+                            help='The maximum number of items in a page')
+inventory_args.add_argument('cursor', type=str, required=False, location='args',
+                            help='The opaque cursor from the next link of the previous page')
+
+delete_args = inventory_args.copy()
+for name in ('sort', 'limit', 'cursor'):
+    delete_args.remove_argument(name)
+delete_args.add_argument('all', type=inputs.boolean, required=False, location='args',
+                         help='Delete every item when there is no filter')
 
 
 
@@ -85,35 +210,89 @@ class InventoryCollection(Resource):
     # ------------------------------------------------------------------
     # LIST ALL inventory
     # ------------------------------------------------------------------
-    @api.doc('list_inventory')
+    @api.doc('list_inventory', __mask__=True)
     @api.expect(inventory_args, validate=True)
-    @api.marshal_list_with(inventory_model)
+    @api.response(200, 'Success', [inventory_model])
+    @api.produces(['application/json', NDJSON])
     def get(self):
-        """Returns a list of the items in the Inventory"""
+        """Returns a list of the items in the Inventory
+
+        Send Accept: application/x-ndjson to stream one item per line
+        """
 
         app.logger.info("Request for Inventory list")
 
-        pid = request.args.get("pid")
-        condition = request.args.get("condition")
-        active = request.args.get("active")
-
-        if pid:
-            app.logger.info("filtered by pid")
-            items = Inventory.find_by_pid(pid)
-        elif condition:
-            app.logger.info("filtered by condition")
-            items = Inventory.find_by_condition(condition)
-        elif active:
-            app.logger.info("filtered by active")
-            active = active in ["true", "True", "TRUE"]
-            items = Inventory.find_by_active(active)
-        else:
-            app.logger.info("find all")
-            items = Inventory.all()
+        filters = filter_args()
+        sort = request.args.get("sort") or None
+        limit = request.args.get("limit")
+        cursor = request.args.get("cursor")
+
+        if sort and (limit is not None or cursor is not None):
+            raise DataValidationError("sort cannot be combined with limit or cursor")
+
+        app.logger.info("filtered by %s", ", ".join(filters) or "nothing")
+        statement = Inventory.select_rows(*Inventory.filter_criteria(**filters))
+
+        if limit is None and cursor is None:
+            if sort:
+                statement = statement.order_by(*parse_sort(sort))
+            if wants_ndjson():
+                app.logger.info("Streaming items as NDJSON")
+                return ndjson_response(Inventory.stream_rows(statement, STREAM_BATCH_SIZE))
+            rows = Inventory.read_rows(statement)
+            app.logger.info("Returning %d items", len(rows))
+            if request.headers.get(app.config["RESTX_MASK_HEADER"]):
+                return marshal_items([serialize_row(row) for row in rows]), status.HTTP_200_OK
+            return json_response(rows)
+
+        # keyset pagination: fetch one extra row to know if there is a next page
+        limit = parse_limit(limit or DEFAULT_PAGE_SIZE)
+        after = decode_key_cursor(cursor) if cursor else None
+        page = Inventory.find_row_page(statement, limit + 1, after)
+
+        headers = {}
+        if len(page) > limit:
+            page = page[:limit]
+            last = page[-1]
+            args = request.args.to_dict()
+            args["limit"] = limit
+            args["cursor"] = encode_cursor(last.pid, last.condition.value)
+            next_url = url_for("inventory_collection", _external=True, **args)
+            headers["Link"] = f'<{next_url}>; rel="next"'
+
+        app.logger.info("Returning page of %d items", len(page))
+        if wants_ndjson():
+            return ndjson_response(page, headers)
+        if request.headers.get(app.config["RESTX_MASK_HEADER"]):
+            results = [serialize_row(row) for row in page]
+            return marshal_items(results), status.HTTP_200_OK, headers
+        return json_response(page, headers)
+
+    # ------------------------------------------------------------------
+    # DELETE ALL MATCHING INVENTORY ITEMS
+    # ------------------------------------------------------------------
+    @api.doc('delete_inventory_list')
+    @api.expect(delete_args)
+    @api.response(400, 'A filter was not valid, or there was no filter and no all=true')
+    @api.marshal_with(delete_result_model)
+    def delete(self):
+        """Deletes every Inventory item matching the filters of the list
+
+        Without any filter nothing is deleted unless all=true is sent.
+        """
+        app.logger.info("Request to delete Inventory items by filter")
+
+        check_args(FILTER_FIELDS + ("active", "all"))
+        filters = filter_args()
+        delete_all = parse_boolean("all", request.args.get("all") or "false")
+        if not filters and not delete_all:
+            raise DataValidationError("Send at least one filter, or all=true to delete every item")
 
-        results = [item.serialize() for item in items]
-        app.logger.info("Returning %d items", len(results))
-        return results, status.HTTP_200_OK
+        items = Inventory.find_by_filters(**filters)
+        count = Inventory.delete_matching(items)
+
+        app.logger.info("Deleted %d Inventory items", count)
+        return {"deleted": count}, status.HTTP_200_OK
 
     # ------------------------------------------------------------------
     # CREATE A NEW INVENTORY ITEM
@@ -155,6 +334,154 @@ class InventoryCollection(Resource):
             {"Location": location_url},
         )
 
+
+######################################################################
+#  PATH: /inventory/low-stock
+######################################################################
+
+page_args = reqparse.RequestParser()
+page_args.add_argument('limit', type=int, required=False, location='args',
+                       help='The maximum number of items in a page')
+page_args.add_argument('cursor', type=str, required=False, location='args',
+                       help='The opaque cursor from the next link of the previous page')
+
+
+@api.route('/inventory/low-stock')
+class LowStockCollection(Resource):
+    """ Handles the report of active inventory below its restock level """
+
+    @api.doc('list_low_stock_inventory')
+    @api.expect(page_args, validate=True)
+    @api.marshal_list_with(low_stock_model)
+    def get(self):
+        """Returns the active Inventory items below their restock level, largest deficit first"""
+        app.logger.info("Request for the low stock report")
+
+        limit = parse_limit(request.args.get("limit") or DEFAULT_PAGE_SIZE)
+        cursor = request.args.get("cursor")
+        after = None
+        if cursor:
+            deficit, pid, condition = decode_cursor(cursor, 3)
+            after = (deficit, pid, parse_cursor_condition(cursor, condition))
+        page = Inventory.find_low_stock(limit + 1, after)
+
+        headers = {}
+        if len(page) > limit:
+            page = page[:limit]
+            last = page[-1]
+            next_cursor = encode_cursor(
+                last.restock_level - last.quantity, last.pid, last.condition.value
+            )
+            next_url = url_for(
+                "low_stock_collection", limit=limit, cursor=next_cursor, _external=True
+            )
+            headers["Link"] = f'<{next_url}>; rel="next"'
+
+        results = []
+        for row in page:
+            data = serialize_row(row)
+            data["deficit"] = row.restock_level - row.quantity
+            results.append(data)
+        app.logger.info("Returning %d low stock items", len(results))
+        return results, status.HTTP_200_OK, headers
+
+
+######################################################################
+#  PATH: /inventory/summary
+######################################################################
+
+@api.route('/inventory/summary')
+class SummaryResource(Resource):
+    """ Handles the stock totals shown on dashboards """
+
+    @api.doc('summarize_inventory')
+    @api.marshal_with(summary_model)
+    def get(self):
+        """Returns the number of items and units per condition and active flag
+
+        The totals are cached for SUMMARY_TTL seconds.
+        """
+        app.logger.info("Request for the inventory summary")
+        return Inventory.summary(), status.HTTP_200_OK
+
+
+######################################################################
+#  PATH: /inventory:batch
+######################################################################
+
+@api.route('/inventory:batch')
+class InventoryBatch(Resource):
+    """ Handles creating many inventory items in a single request """
+
+    # ------------------------------------------------------------------
+    # CREATE MANY NEW INVENTORY ITEMS
+    # ------------------------------------------------------------------
+    @api.doc('create_inventory_batch')
+    @api.response(400, 'The posted data was not a list')
+    @api.response(409, 'The batch conflicted with a concurrent write')
+    @api.response(413, 'The posted list was too large')
+    @api.response(207, 'Some items were not created', [batch_result_model])
+    @api.response(201, 'Every item was created', [batch_result_model])
+    @api.expect([create_model])
+    def post(self):
+        """Creates many Inventory items in a single transaction"""
+        app.logger.info("Request to create a batch of Inventory items")
+        check_content_type("application/json")
+        payload = api.payload
+
+        if not isinstance(payload, list):
+            abort(status.HTTP_400_BAD_REQUEST, "Body must be a list of Inventory items")
+        if len(payload) > MAX_BATCH_SIZE:
+            abort(
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                f"A batch may contain at most {MAX_BATCH_SIZE} items",
+            )
+
+        # validate every item first so one bad item does not stop the batch
+        results = [None] * len(payload)
+        valid, errors = Inventory.validate_many(payload)
+        for index, message in errors:
+            results[index] = {
+                "index": index,
+                "pid": None,
+                "condition": None,
+                "status": status.HTTP_400_BAD_REQUEST,
+                "error": message,
+            }
+
+        # a single lookup finds the keys that already exist
+        existing = Inventory.find_existing_keys(
+            (row["pid"], row["condition"]) for _, row in valid
+        )
+        rows = []
+        for index, row in valid:
+            pid = row["pid"]
+            condition = row["condition"]
+            result = {"index": index, "pid": pid, "condition": condition.value}
+            key = (pid, condition)
+            if key in existing:
+                result["status"] = status.HTTP_409_CONFLICT
+                result["error"] = (
+                    f"Item with PID {pid} and condition {condition.value} already exists"
+                )
+            else:
+                existing.add(key)
+                rows.append(row)
+                result["status"] = status.HTTP_201_CREATED
+            results[index] = result
+
+        try:
+            Inventory.bulk_insert(rows)
+        except IntegrityError:
+            abort(
+                status.HTTP_409_CONFLICT,
+                "The batch conflicted with a concurrent write, nothing was created",
+            )
+
+        app.logger.info("Created %d of %d Inventory items", len(rows), len(payload))
+        code = status.HTTP_201_CREATED if len(rows) == len(payload) else status.HTTP_207_MULTI_STATUS
+        return results, code
+
 ######################################################################
 # PATH /inventory/{inventory}
 ######################################################################
@@ -171,40 +498,61 @@ class InventoryResource(Resource):
     #------------------------------------------------------------------
     # RETRIEVE A inventory
     #------------------------------------------------------------------
-    @api.doc('get_inventory')
+    @api.doc('get_inventory', __mask__=True)
     @api.response(404, 'inventory not found')
-    @api.marshal_with(inventory_model)
+    @api.response(304, 'inventory not modified since the ETag in If-None-Match')
+    @api.response(200, 'Success', inventory_model)
     def get(self, pid):
-        """Retrieves Inventory items"""
+        """Retrieves Inventory items
+
+        Send the ETag of a previous response in If-None-Match to get a 304
+        when nothing changed
+        """
 
         condition = None
         condition = request.args.get("condition")
         if condition:
             app.logger.info(f"Request for item {pid} with condition {condition}")
-            results = Inventory.find_by_pid_condition(pid, condition)
 
-            if not results:
+            # only the version is needed to answer a conditional request
+            if request.if_none_match:
+                version = Inventory.find_version(pid, condition)
+                if version is not None and request.if_none_match.contains_weak(item_etag(version)):
+                    return not_modified(item_etag(version))
+
+            items = Inventory.find_serialized(pid, condition)
+
+            if not items:
                 message = (
                     f"No items could be found for PID: {pid} and Condition {condition}"
                 )
                 app.logger.info(message)
                 abort(status.HTTP_404_NOT_FOUND, message)
 
-            items = results.serialize()
+            etag = item_etag(items["version"])
 
         else:
             app.logger.info(f"Request for items with {pid}")
-            results = Inventory.find_by_pid(pid)
 
-            if results.count() == 0:
+            if request.if_none_match:
+                versions = Inventory.find_versions(pid)
+                if versions and request.if_none_match.contains_weak(items_etag(versions)):
+                    return not_modified(items_etag(versions))
+
+            rows = Inventory.read_rows(
+                Inventory.select_rows(*Inventory.filter_criteria(pid=pid))
+            )
+
+            if not rows:
                 message = f"No items could be found for PID: {pid}"
                 app.logger.info(message)
                 abort(status.HTTP_404_NOT_FOUND, message)
 
-            items = [item.serialize() for item in results]
+            items = [serialize_row(row) for row in rows]
+            etag = items_etag((row.condition, row.version) for row in rows)
 
         app.logger.info("Returning %d Inventory items", len(items))
-        return items, status.HTTP_200_OK
+        return marshal_items(items), status.HTTP_200_OK, {"ETag": quote_etag(etag)}
 
     #------------------------------------------------------------------
     # UPDATE AN EXISTING INVENTORY ITEM
@@ -213,15 +561,25 @@ class InventoryResource(Resource):
     @api.doc('update_inventory')
     @api.response(404, 'Inventory not found')
     @api.response(400, 'The posted Inventory data was not valid')
+    @api.response(409, 'Inventory was changed by a concurrent update')
+    @api.response(412, 'Inventory was changed since the version in If-Match')
     @api.expect(inventory_model)
     @api.marshal_with(inventory_model)
     def put(self, pid):
         
-        """Updates an Inventory item"""
+        """Updates an Inventory item
+
+        Send the ETag from a GET in If-Match, or the version in the body,
+        to only update the item if nobody else changed it in between
+        """
         app.logger.info("Request to update Inventory item with PID: %s", pid)
         check_content_type("application/json")
         arguments = api.payload
 
+        version = expected_version(arguments)
+        if version is not None:
+            return update_if_version(pid, arguments, version)
+
         item = Inventory.find_by_pid_condition(pid, arguments["condition"])
 
         if not item:
@@ -231,12 +589,18 @@ class InventoryResource(Resource):
             )
 
         item = item.deserialize(api.payload)
-        item.update()
+        try:
+            item.update()
+        except StaleDataError:
+            abort(
+                status.HTTP_409_CONFLICT,
+                f"Item with PID '{pid}' and condition {arguments['condition']} was changed concurrently",
+            )
 
         app.logger.info(
             f"Inventory item with PID {pid} and condition {arguments['condition']} updated"
         )
-        return item.serialize(), status.HTTP_200_OK
+        return item.serialize(), status.HTTP_200_OK, {"ETag": quote_etag(item_etag(item.version))}
 
 
     #------------------------------------------------------------------
@@ -248,11 +612,8 @@ class InventoryResource(Resource):
         """Delete an Inventory item"""
         app.logger.info("Request to delete all Inventory items with PID: %s", pid)
 
-        items = Inventory.find_by_pid(pid)
-        if items.count() != 0:
-            for i in items:
-                i.delete()
-
+        count = Inventory.delete_matching(Inventory.find_by_pid(pid))
+        if count != 0:
             app.logger.info(f"All Inventory items with PID {pid} deleted")
 
         return "", status.HTTP_204_NO_CONTENT
@@ -282,9 +643,10 @@ class InventoryDelResource(Resource):
             f"Request to delete Inventory item with PID: {pid} and Condition {condition}"
         )
 
-        item = Inventory.find_by_pid_condition(pid, condition)
-        if item:
-            item.delete()
+        count = Inventory.delete_matching(
+            Inventory.find_by_filters(pid=pid, condition=condition)
+        )
+        if count != 0:
             app.logger.info(
                 f"Inventory item with PID {pid}" f" and Condition {condition} deleted"
             )
@@ -298,6 +660,91 @@ class InventoryDelResource(Resource):
 
 
 
+######################################################################
+# PATH /inventory/<int:pid>/<int:condition>/adjust
+######################################################################
+@api.route('/inventory/<int:pid>/<int:condition>/adjust')
+@api.param('pid', 'The Inventory identifier')
+@api.param('condition', 'The Inventory Condition identifier')
+class AdjustResource(Resource):
+    "Atomic quantity adjustment for a Inventory"
+    @api.doc('adjust_inventory')
+    @api.response(404, 'Inventory not found')
+    @api.response(409, 'Not enough Inventory in stock')
+    @api.response(400, 'The posted delta was not valid')
+    @api.expect(adjust_model)
+    @api.marshal_with(inventory_model)
+    def post(self, pid, condition):
+        """Adds a signed delta to the quantity of an Inventory item"""
+        app.logger.info(
+            f"Request to adjust quantity of item with PID {pid} and condition {condition}"
+        )
+        check_content_type("application/json")
+        payload = api.payload
+        if not isinstance(payload, dict) or "delta" not in payload:
+            raise DataValidationError("Invalid adjustment: missing delta")
+        delta = payload["delta"]
+
+        item = Inventory.adjust_quantity(pid, condition, delta)
+        if not item:
+            if not Inventory.find_by_pid_condition(pid, condition):
+                abort(
+                    status.HTTP_404_NOT_FOUND,
+                    f"Item with PID {pid} and Condition {condition} not found.",
+                )
+            if delta > 0:
+                raise DataValidationError(
+                    f"Item with PID {pid} and Condition {condition} cannot hold {delta} more."
+                )
+            abort(
+                status.HTTP_409_CONFLICT,
+                f"Item with PID {pid} and Condition {condition} has less than {-delta} in stock.",
+            )
+
+        app.logger.info(f"Item with PID {pid}: quantity adjusted by {delta}.")
+        return item, status.HTTP_200_OK, {"ETag": quote_etag(item_etag(item["version"]))}
+
+
+######################################################################
+# PATH /inventory/activate
+######################################################################
+@api.route('/inventory/activate')
+class ActivateCollection(Resource):
+    """ Handles activating many inventory items at once """
+
+    @api.doc('activate_inventory_list')
+    @api.response(400, 'The keys or the filters were not valid')
+    @api.response(413, 'The posted list was too large')
+    @api.expect([key_model])
+    @api.marshal_with(update_result_model)
+    def put(self):
+        """Activates the Inventory items in the posted list of keys, or matching the filters of the list"""
+        app.logger.info("Request to activate Inventory items")
+        count = set_active_matching(True)
+        app.logger.info("Activated %d Inventory items", count)
+        return {"updated": count}, status.HTTP_200_OK
+
+
+######################################################################
+# PATH /inventory/deactivate
+######################################################################
+@api.route('/inventory/deactivate')
+class DeactivateCollection(Resource):
+    """ Handles deactivating many inventory items at once """
+
+    @api.doc('deactivate_inventory_list')
+    @api.response(400, 'The keys or the filters were not valid')
+    @api.response(413, 'The posted list was too large')
+    @api.expect([key_model])
+    @api.marshal_with(update_result_model)
+    def put(self):
+        """Deactivates the Inventory items in the posted list of keys, or matching the filters of the list"""
+        app.logger.info("Request to deactivate Inventory items")
+        count = set_active_matching(False)
+        app.logger.info("Deactivated %d Inventory items", count)
+        return {"updated": count}, status.HTTP_200_OK
+
+
 ######################################################################
 # PATH /inventory/activate/<int:pid>/<int:condition>
 ######################################################################
@@ -322,6 +769,7 @@ class ActivateResource(Resource):
             )
 
         item.activate()
+        item.update()
         app.logger.info(f"Item with PID {pid}: active status is set to true.")
         return item.serialize(), status.HTTP_200_OK
 
@@ -350,6 +798,7 @@ class DeactivateResource(Resource):
             )
 
         item.deactivate()
+        item.update()
         app.logger.info(f"Item with PID {pid}: active status is set to true.")
         return item.serialize(), status.HTTP_200_OK
 
@@ -365,17 +814,269 @@ def health():
     return jsonify(status="OK"), status.HTTP_200_OK
 
 
+# the result of the last database check, so frequent probes don't add load
+readiness_cache = LRUCache(maxsize=1, ttl=app.config.get("READINESS_TTL", 5.0))
+
+# when the connection pool of this worker was first seen exhausted, None while it is not
+pool_saturation = {"since": None}
+
+
+@app.route("/health/ready", methods=["GET"])
+def health_ready():
+    """Get the readiness of this worker to serve requests
+
+    The worker is ready when the database answers and the connection pool
+    has not been exhausted for longer than READINESS_SATURATION_GRACE
+    seconds. The pool is read first and without a checkout: while it is
+    exhausted the database check would wait for a connection longer than
+    the probe timeout, so it is skipped. The database check is cached for
+    READINESS_TTL seconds.
+    """
+    pool = pool_stats(db.engine.pool)
+    saturated = (pool.get("saturation") or 0) >= 1
+
+    database = readiness_cache.get("database")
+    if database is None and not saturated:
+        database = check_database()
+        readiness_cache.set("database", database)
+    elif database is None:
+        # every connection is checked out, so the database did answer them
+        database = {"status": "OK", "skipped": True}
+
+    ready = database["status"] == "OK"
+    if ready and pool_exhausted(saturated):
+        app.logger.warning("Connection pool is exhausted")
+        ready = False
+    result = {
+        "status": "OK" if ready else "UNAVAILABLE",
+        "database": database,
+        "pool": pool,
+    }
+    code = status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE
+    return jsonify(result), code
+
+
+@app.route("/health/pool", methods=["GET"])
+def health_pool():
+    """Get the state of the database connection pool of this worker"""
+    return jsonify(pool_stats(db.engine.pool)), status.HTTP_200_OK
+
+
 ######################################################################
 #  U T I L I T Y   F U N C T I O N S
 ######################################################################
 
 
-def init_db():
-    """Initializes the SQLAlchemy app"""
+def init_app():
+    """Configures the SQLAlchemy app, it connects on the first request"""
     # pylint: disable=global-variable-not-assigned
     # pylint: disable=invalid-name
     global app
-    Inventory.init_db(app)
+    Inventory.init_app(app)
+
+
+def pool_exhausted(saturated):
+    """Returns True once the pool has stayed saturated for READINESS_SATURATION_GRACE seconds"""
+    if not saturated:
+        pool_saturation["since"] = None
+        return False
+    now = time.monotonic()
+    if pool_saturation["since"] is None:
+        pool_saturation["since"] = now
+    return now - pool_saturation["since"] >= app.config.get("READINESS_SATURATION_GRACE", 30.0)
+
+
+def check_database():
+    """Runs a trivial query and returns its status and latency"""
+    start = time.perf_counter()
+    try:
+        with db.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except SQLAlchemyError as error:
+        app.logger.error("Database check failed: %s", error)
+        database = {"status": "UNAVAILABLE", "error": type(error).__name__}
+    else:
+        database = {"status": "OK"}
+    database["latency_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return database
+
+
+def filter_args():
+    """Reads the list filters that are present in the query string"""
+    return parse_filters(request.args)
+
+
+def set_active_matching(active):
+    """Sets the active flag of the items in the posted list of keys, or matching the filters
+
+    A request without keys or filters is refused rather than changing every item,
+    as is a misspelled filter or an active that is not true or false.
+    """
+    check_args(FILTER_FIELDS + ("active",))
+    filters = filter_args()
+    if not request.get_data():
+        if not filters:
+            raise DataValidationError("Send a list of keys or at least one filter")
+        return Inventory.set_active(active, criteria=Inventory.filter_criteria(**filters))
+
+    if filters:
+        raise DataValidationError("Send either a list of keys or filters, not both")
+    check_content_type("application/json")
+    payload = api.payload
+    if not isinstance(payload, list):
+        abort(status.HTTP_400_BAD_REQUEST, "Body must be a list of Inventory keys")
+    if len(payload) > MAX_BATCH_SIZE:
+        abort(
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            f"A batch may contain at most {MAX_BATCH_SIZE} keys",
+        )
+    keys, errors = Inventory.validate_keys(payload)
+    if errors:
+        index, message = errors[0]
+        raise DataValidationError(f"Key {index} is invalid: {message}")
+    return Inventory.set_active(active, keys=keys)
+
+
+def parse_filters(args):
+    """Returns the list filters that are present in a MultiDict of query arguments"""
+    filters = {}
+    for field in FILTER_FIELDS:
+        value = args.get(field)
+        if value:
+            filters[field] = value
+
+    active = args.get("active")
+    if active:
+        filters["active"] = parse_boolean("active", active)
+    return filters
+
+
+def parse_boolean(field, value):
+    """Converts a true or false query argument into a bool, refusing anything else"""
+    try:
+        return inputs.boolean(value)
+    except ValueError as error:
+        raise DataValidationError(f"{field} {value} is invalid: use true or false") from error
+
+
+def check_args(allowed):
+    """Refuses a query string with an argument that is not allowed, such as a misspelled filter"""
+    unknown = sorted(set(request.args) - set(allowed))
+    if unknown:
+        raise DataValidationError(f"Unknown query arguments: {', '.join(unknown)}")
+
+
+def marshal_items(results):
+    """Marshals serialized items, honoring the X-Fields mask"""
+    mask = request.headers.get(app.config["RESTX_MASK_HEADER"])
+    return marshal(results, inventory_model, mask=mask)
+
+
+def expected_version(payload):
+    """Returns the version a conditional update expects, from If-Match or the body"""
+    if request.if_match and not request.if_match.star_tag:
+        tags = request.if_match.as_set()
+        if len(tags) != 1:
+            raise DataValidationError("If-Match must contain a single strong ETag")
+        value = tags.pop()
+    elif isinstance(payload, dict) and payload.get("version") is not None:
+        value = payload["version"]
+    else:
+        return None
+
+    try:
+        return int(value)
+    except (TypeError, ValueError) as error:
+        raise DataValidationError(f"Version {value} is invalid") from error
+
+
+def update_if_version(pid, payload, version):
+    """Updates an Inventory item only if it is still at version, without row locks"""
+    item = Inventory(pid=-100, condition=Condition(0)).deserialize(payload)
+    if not Inventory.update_if_version(pid, item, version):
+        if not Inventory.find_by_pid_condition(pid, item.condition.value):
+            abort(
+                status.HTTP_404_NOT_FOUND,
+                f"Item with PID '{pid}' and condition {item.condition.value} does not exist",
+            )
+        abort(
+            status.HTTP_412_PRECONDITION_FAILED,
+            f"Item with PID '{pid}' and condition {item.condition.value} is no longer at version {version}",
+        )
+
+    app.logger.info(
+        f"Inventory item with PID {pid} and condition {item.condition.value} updated from version {version}"
+    )
+    data = Inventory.find_serialized(item.pid, item.condition.value)
+    return data, status.HTTP_200_OK, {"ETag": quote_etag(item_etag(data["version"]))}
+
+
+def item_etag(version):
+    """Returns the ETag of a single Inventory item"""
+    return str(version)
+
+
+def items_etag(versions):
+    """Returns the ETag of a list of Inventory items from their (condition, version)"""
+    pairs = sorted(f"{condition.value}:{version}" for condition, version in versions)
+    return hashlib.sha1(",".join(pairs).encode("ascii")).hexdigest()[:20]
+
+
+def not_modified(etag):
+    """Returns an empty 304 Not Modified response"""
+    response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    response.set_etag(etag)
+    return response
+
+
+def wants_ndjson():
+    """Returns True when the client prefers newline delimited JSON"""
+    return request.accept_mimetypes.best_match(["application/json", NDJSON]) == NDJSON
+
+
+def json_response(rows, headers=None):
+    """Returns rows of Inventory.select_rows() as a JSON list without marshaling"""
+    return Response(
+        serializers.dumps_rows(rows),
+        status=status.HTTP_200_OK,
+        mimetype="application/json",
+        headers=headers,
+    )
+
+
+def ndjson_response(rows, headers=None):
+    """Streams rows of Inventory.select_rows() as newline delimited JSON without building a list"""
+
+    def generate():
+        lines = []
+        for data in serializers.row_dicts(rows):
+            lines.append(serializers.dumps(data))
+            if len(lines) == STREAM_BATCH_SIZE:
+                yield b"\n".join(lines) + b"\n"
+                lines = []
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+
+    return Response(
+        stream_with_context(generate()),
+        status=status.HTTP_200_OK,
+        mimetype=NDJSON,
+        headers=headers,
+    )
+
+
+def decode_key_cursor(cursor):
+    """Decodes a pagination cursor into a (pid, condition) key"""
+    pid, condition_value = decode_cursor(cursor, 2)
+    return pid, parse_cursor_condition(cursor, condition_value)
+
+
+def parse_cursor_condition(cursor, condition_value):
+    """Converts the condition value stored in a cursor into a Condition"""
+    try:
+        return Condition(condition_value)
+    except ValueError as error:
+        raise DataValidationError(f"Cursor {cursor} is invalid") from error
 
 
 def check_content_type(content_type):
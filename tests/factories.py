@@ -1,8 +1,15 @@
 """ Test factory to create Inventory objects for testing"""
+import random
+import string
 import factory
 from factory.fuzzy import FuzzyInteger, FuzzyText, FuzzyChoice
 from service.models import Inventory, Condition
 
+CONDITIONS = [Condition.NEW, Condition.OPEN_BOX, Condition.USED]
+NAME_LENGTH = 10
+QUANTITY_RANGE = (1, 100)
+RESTOCK_LEVEL_RANGE = (1, 100)
+
 
 class InventoryFactory(factory.Factory):
     """Creates fake items that you don't have to feed"""
@@ -12,8 +19,31 @@ class InventoryFactory(factory.Factory):
         model = Inventory
 
     pid = factory.Sequence(lambda n: n)
-    condition = FuzzyChoice(choices=[Condition.NEW, Condition.OPEN_BOX, Condition.USED])
-    name = FuzzyText(length=10)
-    quantity = FuzzyInteger(1, 100)
-    restock_level = FuzzyInteger(1, 100)
+    condition = FuzzyChoice(choices=CONDITIONS)
+    name = FuzzyText(length=NAME_LENGTH)
+    quantity = FuzzyInteger(*QUANTITY_RANGE)
+    restock_level = FuzzyInteger(*RESTOCK_LEVEL_RANGE)
     active = FuzzyChoice(choices=[True, False])
+
+
+def inventory_rows(count, start=0, seed=None):
+    """Yields count rows of column values distributed like InventoryFactory
+
+    The rows are plain dicts for a Core insert, so millions of them can be
+    generated without building a model object each. The same seed always
+    generates the same rows.
+    """
+    rng = random.Random(seed)
+    choice = rng.choice
+    choices = rng.choices
+    randint = rng.randint
+    letters = string.ascii_letters
+    for pid in range(start, start + count):
+        yield {
+            "pid": pid,
+            "condition": choice(CONDITIONS),
+            "name": "".join(choices(letters, k=NAME_LENGTH)),
+            "quantity": randint(*QUANTITY_RANGE),
+            "restock_level": randint(*RESTOCK_LEVEL_RANGE),
+            "active": rng.random() < 0.5,
+        }
@@ -0,0 +1,73 @@
+"""
+Cache Test Suite
+"""
+from unittest import TestCase
+from service.common.cache import LRUCache
+
+
+class FakeClock:
+    """A clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache(TestCase):
+    """Test Cases for the LRU Cache"""
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = LRUCache(maxsize=2, ttl=10, clock=self.clock)
+
+    def test_get_and_set(self):
+        """It should return stored values and count hits and misses"""
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.set("a", 1)
+        self.assertEqual(self.cache.get("a"), 1)
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["size"], 1)
+
+    def test_evict_least_recently_used(self):
+        """It should evict the least recently used value when full"""
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("c"), 3)
+
+    def test_expire(self):
+        """It should not return values older than the ttl"""
+        self.cache.set("a", 1)
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_invalidate(self):
+        """It should forget invalidated and cleared values"""
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.invalidate("a")
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get("b"), 2)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get("b"))
+
+    def test_set_after_invalidate(self):
+        """It should not store a value read before an invalidation"""
+        generation = self.cache.generation
+        self.cache.invalidate("a")
+        self.cache.set("a", 1, generation)
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_disabled(self):
+        """It should not store anything when maxsize is 0"""
+        cache = LRUCache(maxsize=0)
+        cache.set("a", 1)
+        self.assertIsNone(cache.get("a"))
@@ -5,7 +5,7 @@ import os
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
 from click.testing import CliRunner
-from service.common.cli_commands import db_create
+from service.common.cli_commands import db_create, db_create_indexes, db_init
 
 
 class TestFlaskCLI(TestCase):
@@ -21,3 +21,23 @@ class TestFlaskCLI(TestCase):
         with patch.dict(os.environ, {"FLASK_APP": "service:app"}, clear=True):
             result = self.runner.invoke(db_create)
             self.assertEqual(result.exit_code, 0)
+
+    @patch("service.common.cli_commands.create_schema")
+    @patch("service.common.cli_commands.db")
+    def test_db_init(self, db_mock, create_schema_mock):
+        """It should call the db-init command"""
+        create_schema_mock.return_value = (["version"], ["version"], ["ix_inventory_name"])
+        with patch.dict(os.environ, {"FLASK_APP": "service:app"}, clear=True):
+            result = self.runner.invoke(db_init)
+            self.assertEqual(result.exit_code, 0)
+        create_schema_mock.assert_called_once_with(db_mock.engine)
+
+    @patch("service.common.cli_commands.create_indexes")
+    @patch("service.common.cli_commands.db")
+    def test_db_create_indexes(self, db_mock, create_indexes_mock):
+        """It should call the db-create-indexes command"""
+        create_indexes_mock.return_value = ["ix_inventory_name"]
+        with patch.dict(os.environ, {"FLASK_APP": "service:app"}, clear=True):
+            result = self.runner.invoke(db_create_indexes)
+            self.assertEqual(result.exit_code, 0)
+        create_indexes_mock.assert_called_once_with(db_mock.engine)
@@ -0,0 +1,104 @@
+"""
+Gunicorn Configuration Test Suite
+"""
+import os
+import tempfile
+import importlib.util
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+MEBIBYTE = 1024 * 1024
+
+spec = importlib.util.spec_from_file_location(
+    "gunicorn_conf", os.path.join(os.path.dirname(__file__), "..", "gunicorn.conf.py")
+)
+gunicorn_conf = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(gunicorn_conf)
+
+
+class TestGunicornConf(TestCase):
+    """Test Cases for sizing the workers to the cgroup limits"""
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def write(self, path, text):
+        """Writes a cgroup file under the temporary root"""
+        path = os.path.join(self.root.name, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="ascii") as file:
+            file.write(text + "\n")
+
+    def test_cgroup_v2_limits(self):
+        """It should read the CPU and memory limits of cgroup v2"""
+        self.write("cpu.max", "20000 100000")
+        self.write("memory.max", str(64 * MEBIBYTE))
+        self.assertEqual(gunicorn_conf.cgroup_cpus(self.root.name), 0.2)
+        self.assertEqual(gunicorn_conf.cgroup_memory(self.root.name), 64 * MEBIBYTE)
+
+    def test_cgroup_v2_unlimited(self):
+        """It should return None for unlimited cgroup v2 resources"""
+        self.write("cpu.max", "max 100000")
+        self.write("memory.max", "max")
+        self.assertIsNone(gunicorn_conf.cgroup_cpus(self.root.name))
+        self.assertIsNone(gunicorn_conf.cgroup_memory(self.root.name))
+
+    def test_cgroup_v1_limits(self):
+        """It should read the CPU and memory limits of cgroup v1"""
+        self.write("cpu/cpu.cfs_quota_us", "150000")
+        self.write("cpu/cpu.cfs_period_us", "100000")
+        self.write("memory/memory.limit_in_bytes", "9223372036854771712")
+        self.assertEqual(gunicorn_conf.cgroup_cpus(self.root.name), 1.5)
+        self.assertIsNone(gunicorn_conf.cgroup_memory(self.root.name))
+        self.write("cpu/cpu.cfs_quota_us", "-1")
+        self.assertIsNone(gunicorn_conf.cgroup_cpus(self.root.name))
+
+    def test_no_cgroup(self):
+        """It should return None when there is no cgroup"""
+        self.assertIsNone(gunicorn_conf.cgroup_cpus(self.root.name))
+        self.assertIsNone(gunicorn_conf.cgroup_memory(self.root.name))
+
+    def test_worker_count(self):
+        """It should size the workers to the CPU and memory limits"""
+        worker = 40 * MEBIBYTE
+        self.assertEqual(gunicorn_conf.worker_count(0.2, 64 * MEBIBYTE, worker), 1)
+        self.assertEqual(gunicorn_conf.worker_count(2, 1024 * MEBIBYTE, worker), 5)
+        self.assertEqual(gunicorn_conf.worker_count(2, 128 * MEBIBYTE, worker), 3)
+        self.assertEqual(gunicorn_conf.worker_count(2, 16 * MEBIBYTE, worker), 1)
+
+    def test_init_schema(self):
+        """It should create the schema, retrying while the database is unreachable"""
+        log = MagicMock()
+        error = OperationalError("SELECT 1", {}, Exception("connection refused"))
+        with patch("service.models.create_schema", side_effect=[error, ([], [], ["ix"])]) as mock:
+            with patch.object(gunicorn_conf.time, "sleep") as sleep_mock:
+                gunicorn_conf.init_schema(log, wait=10)
+        self.assertEqual(mock.call_count, 2)
+        sleep_mock.assert_called_once_with(0.5)
+        log.warning.assert_called_once()
+        log.info.assert_called_once_with("Created index %s", "ix")
+
+    def test_init_schema_concurrent_ddl(self):
+        """It should retry when another instance creates the same schema at the same time"""
+        error = ProgrammingError("CREATE TABLE inventory", {}, Exception("already exists"))
+        with patch("service.models.create_schema", side_effect=[error, ([], [], [])]) as mock:
+            with patch.object(gunicorn_conf.time, "sleep"):
+                gunicorn_conf.init_schema(MagicMock(), wait=10)
+        self.assertEqual(mock.call_count, 2)
+
+    def test_init_schema_off_by_default(self):
+        """It should leave the schema to flask db-init unless GUNICORN_INIT_DB=1"""
+        self.assertFalse(gunicorn_conf.INIT_DB)
+        with patch.object(gunicorn_conf, "init_schema") as init_schema_mock:
+            gunicorn_conf.on_starting(MagicMock())
+        init_schema_mock.assert_not_called()
+
+    def test_init_schema_gives_up(self):
+        """It should raise when the database does not come up in time"""
+        error = OperationalError("SELECT 1", {}, Exception("connection refused"))
+        with patch("service.models.create_schema", side_effect=error):
+            self.assertRaises(OperationalError, gunicorn_conf.init_schema, MagicMock(), 0)
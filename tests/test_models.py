@@ -3,8 +3,24 @@ import os
 import logging
 import unittest
 from service import app
-from service.models import Inventory, db, DataValidationError #, Condition
-from tests.factories import InventoryFactory
+from service.models import (
+    Inventory,
+    Condition,
+    db,
+    DataValidationError,
+    MAX_INTEGER,
+    add_missing_columns,
+    create_indexes,
+    create_schema,
+    widen_columns,
+    serialize_row,
+    prefix_end,
+)
+from unittest.mock import MagicMock, patch
+import sqlalchemy
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm.exc import StaleDataError
+from tests.factories import InventoryFactory, inventory_rows
 
 
 DATABASE_URI = os.getenv(
@@ -37,6 +53,8 @@ class TestInventory(unittest.TestCase):
         """This runs before each test"""
         db.session.query(Inventory).delete()
         db.session.commit()
+        Inventory.cache.clear()
+        Inventory.summary_cache.clear()
 
     def tearDown(self):
         """This runs after each test"""
@@ -71,6 +89,31 @@ class TestInventory(unittest.TestCase):
         inventory = Inventory.all()
         self.assertEqual(len(inventory), 1)
 
+    def test_bulk_insert_items(self):
+        """It should Add many items to the Inventory at once"""
+        items = InventoryFactory.create_batch(5)
+        Inventory.bulk_insert([item.as_row() for item in items])
+        self.assertEqual(len(Inventory.all()), 5)
+
+    def test_bulk_insert_generated_rows(self):
+        """It should Add generated rows that are valid and reproducible"""
+        rows = list(inventory_rows(50, start=10, seed=1))
+        self.assertEqual(rows, list(inventory_rows(50, start=10, seed=1)))
+        Inventory.bulk_insert(rows)
+        items = Inventory.all()
+        self.assertEqual(len(items), 50)
+        self.assertEqual({item.pid for item in items}, set(range(10, 60)))
+        for item in items:
+            self.assertTrue(1 <= item.quantity <= 100)
+
+    def test_find_existing_keys(self):
+        """It should Find which keys are already in the Inventory"""
+        items = InventoryFactory.create_batch(3)
+        items[0].create()
+        keys = [(item.pid, item.condition) for item in items]
+        existing = Inventory.find_existing_keys(keys)
+        self.assertEqual(existing, {keys[0]})
+
     # ----------------------------------------------------------
     # TEST READ
     # ----------------------------------------------------------
@@ -109,6 +152,96 @@ class TestInventory(unittest.TestCase):
         self.assertEqual(items[0].pid, item.pid)
         self.assertEqual(items[0].quantity, 200)
 
+    def test_update_an_item_version(self):
+        """It should bump the version of an item on every Update"""
+        item = InventoryFactory()
+        item.create()
+        first = item.version
+        self.assertGreater(first, 1)
+        item.quantity += 1
+        item.update()
+        self.assertEqual(item.version, first + 1)
+        self.assertEqual(Inventory.find_version(item.pid, item.condition.value), first + 1)
+        self.assertEqual(Inventory.find_versions(item.pid), [(item.condition, first + 1)])
+        self.assertIsNone(Inventory.find_version(item.pid + 1, item.condition.value))
+
+    def test_update_an_item_if_version(self):
+        """It should Update an item only if it is still at a version"""
+        item = InventoryFactory(quantity=1)
+        item.create()
+        changed = InventoryFactory(pid=item.pid, condition=item.condition, quantity=5)
+
+        version = item.version
+        self.assertTrue(Inventory.update_if_version(item.pid, changed, version))
+        self.assertFalse(Inventory.update_if_version(item.pid, changed, version))
+        found = Inventory.find_by_pid_condition(item.pid, item.condition.value)
+        self.assertEqual(found.quantity, 5)
+        self.assertEqual(found.version, version + 1)
+
+    def test_recreated_item_version(self):
+        """It should give an item that is deleted and created again a new version"""
+        item = InventoryFactory()
+        item.create()
+        old_version = item.version
+        item.delete()
+        again = InventoryFactory(pid=item.pid, condition=item.condition)
+        again.create()
+        self.assertGreater(again.version, old_version)
+        again.delete()
+        Inventory.bulk_insert([item.as_row()])
+        self.assertGreater(Inventory.find_version(item.pid, item.condition.value), again.version)
+
+    def test_update_a_stale_item(self):
+        """It should not Update an item that was changed concurrently"""
+        item = InventoryFactory()
+        item.create()
+        db.session.execute(Inventory.__table__.update().values(version=5))
+        item.quantity = 200
+        self.assertRaises(StaleDataError, item.update)
+
+    def test_adjust_quantity(self):
+        """It should Adjust the quantity of an item without going below zero"""
+        item = InventoryFactory(quantity=3)
+        item.create()
+
+        data = Inventory.adjust_quantity(item.pid, item.condition.value, -3)
+        self.assertEqual(data["quantity"], 0)
+        self.assertEqual(data["condition"], item.condition.value)
+        self.assertIsNone(Inventory.adjust_quantity(item.pid, item.condition.value, -1))
+        self.assertRaises(
+            DataValidationError, Inventory.adjust_quantity, item.pid, item.condition.value, True
+        )
+        self.assertRaises(
+            DataValidationError, Inventory.adjust_quantity, item.pid, item.condition.value, 2**70
+        )
+        data = Inventory.adjust_quantity(item.pid, item.condition.value, MAX_INTEGER)
+        self.assertEqual(data["quantity"], MAX_INTEGER)
+        self.assertIsNone(Inventory.adjust_quantity(item.pid, item.condition.value, 1))
+
+    def test_set_active(self):
+        """It should Set the active flag of items by keys or by filters"""
+        items = [InventoryFactory(pid=pid, active=False) for pid in range(4)]
+        Inventory.bulk_insert([item.as_row() for item in items])
+        first = {item.pid: item.version for item in Inventory.all()}
+        keys = [(item.pid, item.condition) for item in items[:2]]
+        Inventory.cache.set(keys[0], {"active": False}, Inventory.cache.generation)
+
+        self.assertEqual(Inventory.set_active(True, keys=keys + keys), 2)
+        self.assertIsNone(Inventory.cache.get(keys[0]))
+        self.assertEqual(Inventory.set_active(True, keys=keys), 0)
+        criteria = Inventory.filter_criteria(min_quantity=0)
+        self.assertEqual(Inventory.set_active(True, criteria=criteria), 2)
+        changed = {item.pid: item.version for item in Inventory.all()}
+        self.assertEqual(changed, {pid: version + 1 for pid, version in first.items()})
+
+    def test_validate_keys(self):
+        """It should Validate a list of keys"""
+        keys, errors = Inventory.validate_keys(
+            [{"pid": 1, "condition": 2}, {"pid": "1", "condition": 0}, {"pid": 2}]
+        )
+        self.assertEqual(keys, [(1, Condition.OPEN_BOX)])
+        self.assertEqual([index for index, _ in errors], [1, 2])
+
     def test_update_an_item_no_pid(self):
         """It should not Update an item if there is no PID"""
         item = InventoryFactory()
@@ -142,6 +275,17 @@ class TestInventory(unittest.TestCase):
         self.assertEqual(len(Inventory.all()), 0)
 
 
+    def test_delete_matching_items(self):
+        """It should Delete every item matched by a query"""
+        items = InventoryFactory.create_batch(5)
+        for item in items:
+            item.create()
+        pid = items[0].pid
+
+        count = Inventory.delete_matching(Inventory.find_by_pid(pid))
+        self.assertEqual(count, 1)
+        self.assertEqual(len(Inventory.all()), 4)
+
     # ----------------------------------------------------------
     # TEST LIST
     # ----------------------------------------------------------
@@ -277,6 +421,72 @@ class TestInventory(unittest.TestCase):
         self.assertEqual(found_item.restock_level, item.restock_level)
         self.assertEqual(found_item.active, item.active)
 
+    def test_read_rows(self):
+        """It should Read plain rows that serialize like the items"""
+        items = InventoryFactory.create_batch(3)
+        for item in items:
+            item.create()
+
+        rows = Inventory.read_rows(Inventory.select_rows())
+        key = lambda data: (data["pid"], data["condition"])  # noqa: E731
+        self.assertEqual(
+            sorted((serialize_row(row) for row in rows), key=key),
+            sorted((item.serialize() for item in items), key=key),
+        )
+        criteria = Inventory.filter_criteria(pid=items[0].pid)
+        rows = Inventory.read_rows(Inventory.select_rows(*criteria))
+        self.assertEqual([row.pid for row in rows], [items[0].pid])
+
+    def test_find_row_page(self):
+        """It should Find pages of rows ordered by PID and Condition"""
+        items = InventoryFactory.create_batch(5)
+        for item in items:
+            item.create()
+
+        first = Inventory.find_row_page(Inventory.select_rows(), 3)
+        self.assertEqual(len(first), 3)
+        last = first[-1]
+        second = Inventory.find_row_page(Inventory.select_rows(), 3, (last.pid, last.condition))
+        self.assertEqual(len(second), 2)
+        pids = [row.pid for row in first + second]
+        self.assertEqual(pids, sorted(item.pid for item in items))
+        streamed = list(Inventory.stream_rows(Inventory.select_rows(), 2))
+        self.assertEqual(len(streamed), 5)
+
+        for condition in Condition:
+            InventoryFactory(pid=1000, condition=condition).create()
+        statement = Inventory.select_rows(*Inventory.filter_criteria(pid=1000))
+        first = Inventory.find_row_page(statement, 2)
+        second = Inventory.find_row_page(statement, 2, (1000, first[-1].condition))
+        self.assertEqual(len(second), 1)
+        self.assertEqual({row.condition for row in first + second}, set(Condition))
+
+    def test_find_serialized_item(self):
+        """It should Find a serialized item and cache it"""
+        item = InventoryFactory()
+        item.create()
+
+        data = Inventory.find_serialized(item.pid, item.condition.value)
+        self.assertEqual(data, item.serialize())
+        hits = Inventory.cache.stats()["hits"]
+        Inventory.find_serialized(item.pid, item.condition.value)
+        self.assertEqual(Inventory.cache.stats()["hits"], hits + 1)
+        self.assertIsNone(Inventory.find_serialized(item.pid + 1, item.condition.value))
+
+    def test_find_serialized_item_invalidated(self):
+        """It should not Find a stale item after an update or delete"""
+        item = InventoryFactory(quantity=1)
+        item.create()
+        Inventory.find_serialized(item.pid, item.condition.value)
+
+        item.quantity = 2
+        item.update()
+        data = Inventory.find_serialized(item.pid, item.condition.value)
+        self.assertEqual(data["quantity"], 2)
+
+        item.delete()
+        self.assertIsNone(Inventory.find_serialized(item.pid, item.condition.value))
+
     def test_find_item_pid(self):
         """It should Find a list of items by PID"""
         items = InventoryFactory.create_batch(5)
@@ -326,6 +536,138 @@ class TestInventory(unittest.TestCase):
             self.assertEqual(item.active, active)
 
 
+    def test_find_item_name(self):
+        """It should Find a list of items by Name"""
+        items = InventoryFactory.create_batch(5)
+        for item in items:
+            item.create()
+        name = items[0].name
+
+        found = Inventory.find_by_name(name)
+        self.assertEqual(found.count(), 1)
+        self.assertEqual(found.first().pid, items[0].pid)
+
+    def test_find_low_stock(self):
+        """It should Find a page of low stock items after a key"""
+        for pid in range(4):
+            InventoryFactory(pid=pid, quantity=pid, restock_level=5, active=True).create()
+        InventoryFactory(pid=9, quantity=9, restock_level=5, active=True).create()
+
+        items = Inventory.find_low_stock(2)
+        self.assertEqual([item.pid for item in items], [0, 1])
+        last = items[-1]
+        after = (last.restock_level - last.quantity, last.pid, last.condition)
+        items = Inventory.find_low_stock(10, after)
+        self.assertEqual([item.pid for item in items], [2, 3])
+
+    def test_create_missing_indexes(self):
+        """It should Create only the indexes that are missing"""
+        index = next(
+            index for index in Inventory.__table__.indexes if index.name == "ix_inventory_name"
+        )
+        db.session.commit()
+        index.drop(bind=db.engine)
+        self.assertEqual(create_indexes(db.engine), ["ix_inventory_name"])
+        self.assertEqual(create_indexes(db.engine), [])
+
+    def test_create_indexes_concurrently(self):
+        """It should Build the missing indexes CONCURRENTLY on PostgreSQL"""
+        engine = MagicMock()
+        engine.dialect = postgresql.dialect()
+        existing = {index.name for index in Inventory.__table__.indexes} - {"ix_inventory_active"}
+        with patch("service.models.index_names", return_value=existing):
+            self.assertEqual(create_indexes(engine), ["ix_inventory_active"])
+        engine.connect.return_value.execution_options.assert_called_once_with(
+            isolation_level="AUTOCOMMIT"
+        )
+        connection = engine.connect.return_value.execution_options.return_value.__enter__.return_value
+        connection.exec_driver_sql.assert_called_once_with(
+            "CREATE INDEX CONCURRENTLY ix_inventory_active ON inventory (active, pid)"
+        )
+
+    def test_add_missing_columns(self):
+        """It should not Add columns that already exist"""
+        self.assertEqual(add_missing_columns(db.engine), [])
+
+    def test_create_schema(self):
+        """It should Create the schema only where it is missing"""
+        db.session.remove()
+        db.drop_all()
+        self.assertEqual(create_schema(db.engine), ([], [], []))
+        self.assertEqual(Inventory.all(), [])
+        self.assertEqual(create_schema(db.engine), ([], [], []))
+
+    def test_widen_columns(self):
+        """It should Widen the INTEGER columns declared as BIGINT on PostgreSQL"""
+        self.assertEqual(widen_columns(db.engine), [])
+        engine = MagicMock()
+        engine.dialect.name = "postgresql"
+        inspector = MagicMock()
+        inspector.get_columns.return_value = [
+            {"name": "pid", "type": sqlalchemy.Integer()},
+            {"name": "version", "type": sqlalchemy.Integer()},
+        ]
+        with patch("service.models.sqlalchemy.inspect", return_value=inspector):
+            self.assertEqual(widen_columns(engine), ["version"])
+        connection = engine.begin.return_value.__enter__.return_value
+        statement = connection.execute.call_args[0][0]
+        self.assertEqual(
+            str(statement), "ALTER TABLE inventory ALTER COLUMN version TYPE BIGINT"
+        )
+
+    def test_find_item_filters(self):
+        """It should Find a list of items matching every filter"""
+        for condition in Condition:
+            item = InventoryFactory(pid=1, condition=condition, active=True)
+            item.create()
+        InventoryFactory(pid=2, condition=Condition.NEW, active=True).create()
+
+        found = Inventory.find_by_filters(pid=1, condition=Condition.NEW.value, active=True)
+        self.assertEqual(found.count(), 1)
+        found = Inventory.find_by_filters(active=True)
+        self.assertEqual(found.count(), 4)
+
+    def test_find_item_combined_filters(self):
+        """It should Find items by name prefix and quantity range in order"""
+        InventoryFactory(name="bolt", quantity=50).create()
+        InventoryFactory(name="bolt-m3", quantity=5).create()
+        InventoryFactory(name="bolt-m4", quantity=15).create()
+        InventoryFactory(name="nut", quantity=10).create()
+
+        found = Inventory.find_by_filters(
+            name="bolt", min_quantity=5, max_quantity=20, sort="-quantity"
+        ).all()
+        self.assertEqual([item.name for item in found], ["bolt-m4", "bolt-m3"])
+
+    def test_find_item_name_prefix(self):
+        """It should Find items by name prefix with an index range"""
+        for name in ("bolt", "bolt-m3", "bolu", "Bolt", "bol", "zz\U0010ffff"):
+            InventoryFactory(name=name).create()
+        found = Inventory.find_by_filters(name="bolt", sort="name").all()
+        self.assertEqual([item.name for item in found], ["bolt", "bolt-m3"])
+        self.assertEqual(Inventory.find_by_filters(name="zz\U0010ffff").count(), 1)
+        self.assertEqual(prefix_end("bolt"), "bolu")
+        self.assertEqual(prefix_end("a\U0010ffff"), "b")
+        self.assertEqual(prefix_end("\ud7ff"), "\ue000")
+        self.assertIsNone(prefix_end(""))
+
+        statement = Inventory.select_rows(*Inventory.filter_criteria(name="bolt"))
+        if db.engine.dialect.name == "sqlite":
+            sql = str(statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+            rows = db.session.execute(sqlalchemy.text("EXPLAIN QUERY PLAN " + sql)).fetchall()
+            self.assertIn("USING INDEX ix_inventory_name", rows[0][-1])
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.assertIn("inventory.name ~>=~", sql)
+        self.assertIn("inventory.name ~<~", sql)
+
+    def test_find_item_bad_filters(self):
+        """It should not Find a list of items with bad filters"""
+        self.assertRaises(DataValidationError, Inventory.find_by_filters, pid="Test")
+        self.assertRaises(DataValidationError, Inventory.find_by_filters, condition="Test")
+        self.assertRaises(DataValidationError, Inventory.find_by_filters, active="Test")
+        self.assertRaises(DataValidationError, Inventory.find_by_filters, min_quantity="Test")
+        self.assertRaises(DataValidationError, Inventory.find_by_filters, sort="color")
+
     def test_find_item_bad_active(self):
         """It should not Find a list of items with a bad Active"""
         self.assertRaises(DataValidationError, Inventory.find_by_active, "Test")
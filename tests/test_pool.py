@@ -0,0 +1,49 @@
+"""
+Connection Pool Test Suite
+"""
+import sqlite3
+from unittest import TestCase
+from sqlalchemy import exc
+from sqlalchemy.pool import NullPool
+from service.common.pool import TimedQueuePool, engine_options, pool_stats
+
+
+class TestPool(TestCase):
+    """Test Cases for the Connection Pool"""
+
+    def setUp(self):
+        self.pool = TimedQueuePool(
+            lambda: sqlite3.connect(":memory:"), pool_size=1, max_overflow=0, timeout=0.01
+        )
+
+    def tearDown(self):
+        self.pool.dispose()
+
+    def test_checkout_wait(self):
+        """It should count checkouts and timeouts"""
+        connection = self.pool.connect()
+        self.assertRaises(exc.TimeoutError, self.pool.connect)
+        stats = pool_stats(self.pool)
+        self.assertEqual(stats["class"], "TimedQueuePool")
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["checked_out"], 1)
+        self.assertEqual(stats["saturation"], 1.0)
+        self.assertGreaterEqual(stats["wait_seconds_max"], 0.01)
+        connection.close()
+        self.assertEqual(pool_stats(self.pool)["saturation"], 0.0)
+
+    def test_other_pool_stats(self):
+        """It should only report the class of pools without a queue"""
+        pool = NullPool(lambda: sqlite3.connect(":memory:"))
+        self.assertEqual(pool_stats(pool), {"class": "NullPool"})
+
+    def test_engine_options(self):
+        """It should only size the pool of server databases"""
+        options = engine_options("sqlite:///test.db", 5, 10, 30, 1800, True)
+        self.assertEqual(options, {"pool_pre_ping": True})
+        options = engine_options("postgresql://localhost/test", 5, 10, 30, 1800, False)
+        self.assertEqual(options["poolclass"], TimedQueuePool)
+        self.assertEqual(options["pool_size"], 5)
+        self.assertEqual(options["max_overflow"], 10)
+        self.assertFalse(options["pool_pre_ping"])
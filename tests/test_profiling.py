@@ -0,0 +1,111 @@
+"""
+Request Profiling Test Suite
+"""
+import os
+import pstats
+import tempfile
+from unittest import TestCase
+from flask import Flask
+from service import app
+from service.common import status
+from service.common.profiling import RequestProfiler, init_profiling
+
+TOKEN = "let-me-in"
+
+
+class TestProfiling(TestCase):
+    """Test Cases for the request profiler and its admin endpoints"""
+
+    def setUp(self):
+        self.profile_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+
+    def tearDown(self):
+        self.profile_dir.cleanup()
+
+    def make_app(self, **config):
+        """Returns a small app with profiling configured by config"""
+        test_app = Flask(__name__)
+        test_app.config.update(PROFILE_DIR=self.profile_dir.name, **config)
+
+        @test_app.route("/work")
+        def work():  # pylint: disable=unused-variable
+            return "done"
+
+        return test_app, init_profiling(test_app)
+
+    def test_off_by_default(self):
+        """It should not wrap the service or register admin endpoints by default"""
+        self.assertNotIsInstance(app.wsgi_app, RequestProfiler)
+        self.assertNotIn("list_profiles", app.view_functions)
+        test_app, profiler = self.make_app()
+        self.assertIsNone(profiler)
+        self.assertNotIn("list_profiles", test_app.view_functions)
+
+    def test_profile_with_token(self):
+        """It should profile only the requests that send the token"""
+        test_app, profiler = self.make_app(PROFILE_TOKEN=TOKEN)
+        client = test_app.test_client()
+        self.assertEqual(client.get("/work").data, b"done")
+        self.assertEqual(client.get("/work", headers={"X-Profile-Token": "wrong"}).data, b"done")
+        self.assertEqual(profiler.profiles(), [])
+        response = client.get("/work", headers={"X-Profile-Token": TOKEN})
+        self.assertEqual(response.data, b"done")
+        names = profiler.profiles()
+        self.assertEqual(len(names), 1)
+        self.assertIn(".GET.work.", names[0])
+
+    def test_sample_requests(self):
+        """It should profile a sample of the requests without a token"""
+        test_app, profiler = self.make_app(PROFILE_SAMPLE_RATE=1.0)
+        client = test_app.test_client()
+        client.get("/work")
+        self.assertEqual(len(profiler.profiles()), 1)
+        self.assertNotIn("list_profiles", test_app.view_functions)
+
+    def test_keep_newest(self):
+        """It should keep only the newest profiles"""
+        test_app, profiler = self.make_app(PROFILE_SAMPLE_RATE=1.0, PROFILE_KEEP=2)
+        client = test_app.test_client()
+        for _ in range(4):
+            client.get("/work")
+        self.assertEqual(len(profiler.profiles()), 2)
+
+    def test_list_and_download(self):
+        """It should list and download the profiles with the token"""
+        test_app, profiler = self.make_app(PROFILE_TOKEN=TOKEN)
+        client = test_app.test_client()
+        headers = {"X-Profile-Token": TOKEN}
+        client.get("/work", headers=headers)
+        self.assertEqual(client.get("/admin/profiles").status_code, status.HTTP_403_FORBIDDEN)
+
+        response = client.get("/admin/profiles", headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        listed = response.get_json()
+        self.assertEqual([profile["name"] for profile in listed], profiler.profiles())
+
+        response = client.get(listed[0]["url"], headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        path = os.path.join(self.profile_dir.name, "download.prof")
+        with open(path, "wb") as file:
+            file.write(response.data)
+        self.assertGreater(pstats.Stats(path).total_calls, 0)
+        # the admin endpoints are never profiled themselves
+        self.assertEqual(len(profiler.profiles()), 2)
+
+    def test_profile_as_text(self):
+        """It should render a profile as text"""
+        test_app, profiler = self.make_app(PROFILE_TOKEN=TOKEN)
+        client = test_app.test_client()
+        headers = {"X-Profile-Token": TOKEN}
+        client.get("/work", headers=headers)
+        url = f"/admin/profiles/{profiler.profiles()[0]}"
+        response = client.get(f"{url}?format=text&limit=5", headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("function calls", response.get_data(as_text=True))
+        self.assertIn("called...", response.get_data(as_text=True))
+        response = client.get(f"{url}?format=text&sort=nope", headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = client.get("/admin/profiles/missing.prof", headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = client.get("/admin/profiles/..%2Fpasswd", headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
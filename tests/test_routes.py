@@ -1,8 +1,13 @@
 """ Inventory API Service Test Suite """
 import os
+import re
+import json
 import logging
 from unittest import TestCase
-from service import app
+from unittest.mock import patch
+from flask_restx import marshal
+from sqlalchemy.exc import OperationalError
+from service import app, routes
 from service.models import db, init_db, Inventory, Condition
 from service.common import status
 from tests.factories import InventoryFactory
@@ -15,6 +20,12 @@ HEALTH_BASE_URL = "/health"
 BASE_URL = "/inventory"
 
 
+def next_link(response):
+    """Returns the URL of the next page from the Link header, if any"""
+    match = re.match(r'<([^>]+)>; rel="next"', response.headers.get("Link", ""))
+    return match.group(1) if match else None
+
+
 ######################################################################
 #  T E S T   I N V E N T O R Y   S E R V I C E
 ######################################################################
@@ -40,6 +51,8 @@ class TestInventoryServer(TestCase):
         self.client = app.test_client()
         db.session.query(Inventory).delete()
         db.session.commit()
+        Inventory.cache.clear()
+        Inventory.summary_cache.clear()
 
     def tearDown(self):
         db.session.remove()
@@ -54,11 +67,81 @@ class TestInventoryServer(TestCase):
         self.assertEqual(resp.status_code, status.HTTP_200_OK)
 
 
+    def test_bad_requests_in_production(self):
+        """It should return 400 for bad data with TESTING off, as in production"""
+        requests = [
+            ("get", BASE_URL, "cursor=zzz"),
+            ("get", BASE_URL, "limit=0"),
+            ("get", BASE_URL, "sort=bogus"),
+            ("get", BASE_URL, "active=maybe"),
+            ("get", BASE_URL, "pid=abc"),
+            ("delete", BASE_URL, ""),
+        ]
+        with patch.dict(app.config, {"TESTING": False, "PROPAGATE_EXCEPTIONS": None}):
+            for method, url, query_string in requests:
+                response = getattr(self.client, method)(url, query_string=query_string)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query_string)
+                self.assertEqual(response.get_json()["error"], "Bad Request")
+            response = self.client.put(
+                f"{BASE_URL}/1", json={"condition": 0}, headers={"If-Match": '"1", "2"'}
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_health_check(self):
         """It should return a 200 OK status"""
         response = self.client.get(f"{HEALTH_BASE_URL}")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_health_ready(self):
+        """It should return the readiness with the database check latency"""
+        routes.readiness_cache.clear()
+        response = self.client.get(f"{HEALTH_BASE_URL}/ready")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertEqual(data["status"], "OK")
+        self.assertEqual(data["database"]["status"], "OK")
+        self.assertIn("latency_ms", data["database"])
+        self.assertIn("class", data["pool"])
+
+    def test_health_not_ready(self):
+        """It should return 503 when the database is unreachable and cache the check"""
+        routes.readiness_cache.clear()
+        error = OperationalError("SELECT 1", {}, Exception("connection refused"))
+        with patch.object(db.engine, "connect", side_effect=error) as connect_mock:
+            response = self.client.get(f"{HEALTH_BASE_URL}/ready")
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response.get_json()["database"]["error"], "OperationalError")
+            response = self.client.get(f"{HEALTH_BASE_URL}/ready")
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(connect_mock.call_count, 1)
+        routes.readiness_cache.clear()
+
+    def test_health_pool_exhausted(self):
+        """It should return 503 only when the connection pool stays exhausted"""
+        routes.readiness_cache.clear()
+        routes.pool_saturation["since"] = None
+        with patch("service.routes.pool_stats", return_value={"saturation": 1.0}), \
+                patch("service.routes.check_database") as check_mock:
+            response = self.client.get(f"{HEALTH_BASE_URL}/ready")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            # the check would wait for a connection, so it is skipped
+            check_mock.assert_not_called()
+            self.assertTrue(response.get_json()["database"]["skipped"])
+
+            routes.pool_saturation["since"] -= app.config["READINESS_SATURATION_GRACE"]
+            response = self.client.get(f"{HEALTH_BASE_URL}/ready")
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        response = self.client.get(f"{HEALTH_BASE_URL}/ready")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(routes.pool_saturation["since"])
+
+    def test_health_pool(self):
+        """It should return the state of the connection pool"""
+        response = self.client.get(f"{HEALTH_BASE_URL}/pool")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("class", response.get_json())
+
     # ----------------------------------------------------------
     # TEST LIST
     # ----------------------------------------------------------
@@ -73,6 +156,65 @@ class TestInventoryServer(TestCase):
         data = response.get_json()
         self.assertEqual(test_item_number, len(data))
 
+    def test_get_inventory_list_ndjson(self):
+        """It should Stream a list of all Inventory items as NDJSON"""
+        for item in InventoryFactory.create_batch(3):
+            item.create()
+        response = self.client.get(BASE_URL, headers={"Accept": "application/x-ndjson"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(len(lines), 3)
+        for line in lines:
+            self.assertIn("pid", json.loads(line))
+
+    def test_get_inventory_page_ndjson(self):
+        """It should Stream a page of Inventory items as NDJSON"""
+        for item in InventoryFactory.create_batch(3):
+            item.create()
+        response = self.client.get(
+            BASE_URL, query_string="limit=2", headers={"Accept": "application/x-ndjson"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), 2)
+        self.assertIsNotNone(next_link(response))
+
+    def test_get_inventory_list_fields_mask(self):
+        """It should only return the fields in the X-Fields mask"""
+        InventoryFactory().create()
+        response = self.client.get(BASE_URL, headers={"X-Fields": "pid,name"})
+        self.assertEqual(set(response.get_json()[0]), {"pid", "name"})
+        response = self.client.get(BASE_URL, query_string="limit=1", headers={"X-Fields": "pid"})
+        self.assertEqual(response.get_json(), [{"pid": Inventory.all()[0].pid}])
+
+    def test_get_inventory_list_fields_mask_condition(self):
+        """It should return the Condition value in a masked list and page"""
+        item = InventoryFactory(condition=Condition.USED)
+        item.create()
+        expected = [{"pid": item.pid, "condition": Condition.USED.value}]
+        response = self.client.get(BASE_URL, headers={"X-Fields": "pid,condition"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json(), expected)
+        response = self.client.get(
+            BASE_URL, query_string="limit=10", headers={"X-Fields": "pid,condition"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json(), expected)
+
+    def test_get_inventory_list_matches_model(self):
+        """It should return the same list as marshaling the serialized items"""
+        for item in InventoryFactory.create_batch(3):
+            item.create()
+        items = sorted(Inventory.all(), key=lambda item: (item.pid, item.condition.value))
+        marshaled = marshal([item.serialize() for item in items], routes.inventory_model)
+        expected = [dict(data) for data in marshaled]
+        response = self.client.get(BASE_URL, query_string="sort=pid,condition")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertEqual(response.get_json(), expected)
+        response = self.client.get(BASE_URL, query_string="limit=10")
+        self.assertEqual(response.get_json(), expected)
+
     # ----------------------------------------------------------
     # TEST READ
     # ----------------------------------------------------------
@@ -91,6 +233,87 @@ class TestInventoryServer(TestCase):
         self.assertEqual(data["pid"], test_item.pid)
         self.assertEqual(Condition(data["condition"]), test_item.condition)
 
+    def test_get_inventory_from_cache(self):
+        """It should Get a hot Inventory item from the cache"""
+        test_item = InventoryFactory()
+        test_item.create()
+        url = f"{BASE_URL}/{test_item.pid}"
+        query_string = f"condition={test_item.condition.value}"
+        self.client.get(url, query_string=query_string)
+        hits = Inventory.cache.stats()["hits"]
+        response = self.client.get(url, query_string=query_string)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["pid"], test_item.pid)
+        self.assertEqual(Inventory.cache.stats()["hits"], hits + 1)
+
+    def test_get_inventory_not_modified(self):
+        """It should return 304 when the Inventory item did not change"""
+        test_item = InventoryFactory()
+        test_item.create()
+        url = f"{BASE_URL}/{test_item.pid}"
+        query_string = f"condition={test_item.condition.value}"
+        response = self.client.get(url, query_string=query_string)
+        etag = response.headers.get("ETag")
+        self.assertIsNotNone(etag)
+
+        response = self.client.get(
+            url, query_string=query_string, headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.get_data(), b"")
+        self.assertEqual(response.headers.get("ETag"), etag)
+        response = self.client.get(
+            url, query_string=query_string, headers={"If-None-Match": f"W/{etag}"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        test_item.quantity += 1
+        test_item.update()
+        response = self.client.get(
+            url, query_string=query_string, headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers.get("ETag"), etag)
+
+    def test_get_inventory_recreated_item(self):
+        """It should not return 304 for an Inventory item deleted and created again"""
+        test_item = InventoryFactory(quantity=10)
+        self.client.post(BASE_URL, json=test_item.serialize())
+        url = f"{BASE_URL}/{test_item.pid}"
+        query_string = f"condition={test_item.condition.value}"
+        etag = self.client.get(url, query_string=query_string).headers["ETag"]
+
+        response = self.client.delete(f"{url}/{test_item.condition.value}")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        test_item.quantity = 20
+        response = self.client.post(BASE_URL, json=test_item.serialize())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(
+            url, query_string=query_string, headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["quantity"], 20)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_get_inventory_list_not_modified(self):
+        """It should return 304 when no Inventory item with the PID changed"""
+        for condition in (Condition.NEW, Condition.USED):
+            InventoryFactory(pid=1, condition=condition).create()
+        response = self.client.get(f"{BASE_URL}/1")
+        etag = response.headers.get("ETag")
+
+        response = self.client.get(f"{BASE_URL}/1", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(f"{BASE_URL}/1", headers={"If-None-Match": f"W/{etag}"})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        InventoryFactory(pid=1, condition=Condition.OPEN_BOX).create()
+        response = self.client.get(f"{BASE_URL}/1", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.get_json()), 3)
+
     def test_get_inventory_with_pid_without_condition(self):
         """It should Get all Inventory items with the given PID"""
         test_item_one = InventoryFactory()
@@ -208,6 +431,53 @@ class TestInventoryServer(TestCase):
         self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
 
 
+    def test_create_batch(self):
+        """It should Create a batch of Inventory items"""
+        items = InventoryFactory.create_batch(5)
+        response = self.client.post(
+            f"{BASE_URL}:batch", json=[item.serialize() for item in items]
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = response.get_json()
+        self.assertEqual([result["status"] for result in data], [201] * 5)
+        self.assertEqual([result["pid"] for result in data], [item.pid for item in items])
+        self.assertEqual(len(Inventory.all()), 5)
+
+    def test_create_batch_partial(self):
+        """It should report a result for every item in a batch"""
+        existing = InventoryFactory()
+        existing.create()
+        new_item = InventoryFactory()
+        bad_item = InventoryFactory().serialize()
+        bad_item["quantity"] = "Test"
+        payload = [new_item.serialize(), existing.serialize(), bad_item, new_item.serialize()]
+
+        response = self.client.post(f"{BASE_URL}:batch", json=payload)
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        data = response.get_json()
+        self.assertEqual([result["index"] for result in data], [0, 1, 2, 3])
+        self.assertEqual(
+            [result["status"] for result in data],
+            [
+                status.HTTP_201_CREATED,
+                status.HTTP_409_CONFLICT,
+                status.HTTP_400_BAD_REQUEST,
+                status.HTTP_409_CONFLICT,
+            ],
+        )
+        self.assertIn("quantity", data[2]["error"])
+        self.assertEqual(len(Inventory.all()), 2)
+
+    def test_create_batch_not_a_list(self):
+        """It should not Create a batch that is not a list"""
+        response = self.client.post(f"{BASE_URL}:batch", json=InventoryFactory().serialize())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_batch_no_content_type(self):
+        """It should not Create a batch with no Content-Type"""
+        response = self.client.post(f"{BASE_URL}:batch", data="bad data")
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
     # ----------------------------------------------------------
     # TEST UPDATE
     # ----------------------------------------------------------
@@ -230,6 +500,73 @@ class TestInventoryServer(TestCase):
         updated_item = response.get_json()
         self.assertEqual(updated_item["name"], "Test")
 
+    def test_update_inventory_if_match(self):
+        """It should Update an Inventory item that is still at the If-Match version"""
+        test_item = InventoryFactory()
+        test_item.create()
+        version = test_item.version
+        url = f"{BASE_URL}/{test_item.pid}"
+        response = self.client.get(url, query_string=f"condition={test_item.condition.value}")
+        etag = response.headers["ETag"]
+        new_item = response.get_json()
+        new_item.pop("version")
+        new_item["name"] = "Test"
+
+        response = self.client.put(url, json=new_item, headers={"If-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["name"], "Test")
+        self.assertEqual(response.get_json()["version"], version + 1)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+        response = self.client.put(url, json=new_item, headers={"If-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_update_inventory_recreated_item(self):
+        """It should not Update an Inventory item deleted and created again with an old If-Match"""
+        test_item = InventoryFactory()
+        self.client.post(BASE_URL, json=test_item.serialize())
+        url = f"{BASE_URL}/{test_item.pid}"
+        query_string = f"condition={test_item.condition.value}"
+        etag = self.client.get(url, query_string=query_string).headers["ETag"]
+        self.client.delete(f"{url}/{test_item.condition.value}")
+        self.client.post(BASE_URL, json=test_item.serialize())
+
+        new_item = test_item.serialize()
+        new_item.pop("version")
+        new_item["name"] = "Test"
+        response = self.client.put(url, json=new_item, headers={"If-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.get(url, query_string=query_string)
+        self.assertEqual(response.get_json()["name"], test_item.name)
+
+    def test_update_inventory_stale_version(self):
+        """It should not Update an Inventory item with a stale version in the body"""
+        test_item = InventoryFactory()
+        test_item.create()
+        data = test_item.serialize()
+        test_item.quantity += 1
+        test_item.update()
+
+        response = self.client.put(f"{BASE_URL}/{test_item.pid}", json=data)
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_update_inventory_if_match_does_not_exist(self):
+        """It should not Update an item that does not exist with If-Match"""
+        test_item = InventoryFactory()
+        response = self.client.put(
+            f"{BASE_URL}/{test_item.pid}", json=test_item.serialize(), headers={"If-Match": '"1"'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_inventory_bad_if_match(self):
+        """It should not Update an item with a bad If-Match"""
+        test_item = InventoryFactory()
+        test_item.create()
+        response = self.client.put(
+            f"{BASE_URL}/{test_item.pid}", json=test_item.serialize(), headers={"If-Match": '"Test"'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_update_inventory_does_not_exist(self):
         """It should not Update an item that does not exist"""
         test_item = InventoryFactory()
@@ -309,6 +646,61 @@ class TestInventoryServer(TestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
 
+    def test_delete_items_by_filter(self):
+        """It should Delete all Inventory items matching a filter"""
+        items = InventoryFactory.create_batch(10)
+        for i in items:
+            i.create()
+        test_active = items[0].active
+        active_count = len([item for item in items if item.active == test_active])
+
+        response = self.client.delete(BASE_URL, query_string=f"active={str(test_active)}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["deleted"], active_count)
+        self.assertEqual(len(Inventory.all()), 10 - active_count)
+
+    def test_delete_items_by_pid_and_condition(self):
+        """It should Delete only the items matching every filter"""
+        for condition in Condition:
+            item = InventoryFactory(pid=1, condition=condition)
+            item.create()
+
+        response = self.client.delete(BASE_URL, query_string="pid=1&condition=0")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["deleted"], 1)
+        self.assertEqual(len(Inventory.all()), 2)
+
+    def test_delete_all_items(self):
+        """It should Delete every Inventory item only with all=true when there is no filter"""
+        for item in InventoryFactory.create_batch(3):
+            item.create()
+
+        response = self.client.delete(BASE_URL)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.delete(BASE_URL, query_string="all=false")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(Inventory.all()), 3)
+
+        response = self.client.delete(BASE_URL, query_string="all=true")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["deleted"], 3)
+        self.assertEqual(Inventory.all(), [])
+
+    def test_delete_items_bad_filter(self):
+        """It should not Delete items with a bad filter"""
+        for query_string in ("pid=Test", "active=maybe", "nmae=Test", "name=Test&all=maybe"):
+            response = self.client.delete(BASE_URL, query_string=query_string)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query_string)
+
+    def test_delete_items_unknown_filter(self):
+        """It should not Delete any item when a filter is misspelled"""
+        for item in InventoryFactory.create_batch(3):
+            item.create()
+        response = self.client.delete(BASE_URL, query_string="nmae=Test&all=true")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("nmae", response.get_json()["message"])
+        self.assertEqual(len(Inventory.all()), 3)
+
     # ----------------------------------------------------------
     # TEST QUERY
     # ----------------------------------------------------------
@@ -356,6 +748,240 @@ class TestInventoryServer(TestCase):
         self.assertEqual(active_count, len(data))
 
 
+    def test_query_pid_and_active(self):
+        """It should Get a list of Inventory items matching every filter"""
+        for condition in Condition:
+            InventoryFactory(pid=1, condition=condition, active=condition != Condition.USED).create()
+        InventoryFactory(pid=2, active=True).create()
+
+        response = self.client.get(BASE_URL, query_string="pid=1&active=true")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertEqual(len(data), 2)
+        for item in data:
+            self.assertEqual(item["pid"], 1)
+            self.assertTrue(item["active"])
+
+    def test_query_name_prefix(self):
+        """It should Get a list of Inventory items whose name starts with a prefix"""
+        InventoryFactory(name="widget-large").create()
+        InventoryFactory(name="widget-small").create()
+        InventoryFactory(name="gadget").create()
+        InventoryFactory(name="widget_%").create()
+
+        response = self.client.get(BASE_URL, query_string="name=widget-")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.get_json()), 2)
+        response = self.client.get(BASE_URL, query_string="name=widget_%")
+        self.assertEqual([item["name"] for item in response.get_json()], ["widget_%"])
+
+    def test_query_quantity_range(self):
+        """It should Get a list of Inventory items within a quantity range"""
+        for quantity in (1, 5, 10, 20):
+            InventoryFactory(quantity=quantity).create()
+
+        response = self.client.get(BASE_URL, query_string="min_quantity=5&max_quantity=10")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(item["quantity"] for item in response.get_json()), [5, 10])
+
+    def test_query_sort(self):
+        """It should Get a list of Inventory items in the requested order"""
+        for quantity in (5, 1, 10):
+            InventoryFactory(quantity=quantity).create()
+
+        response = self.client.get(BASE_URL, query_string="sort=-quantity")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["quantity"] for item in response.get_json()], [10, 5, 1])
+
+    def test_query_bad_sort(self):
+        """It should not Get a list sorted by an unknown field"""
+        response = self.client.get(BASE_URL, query_string="sort=color")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(BASE_URL, query_string="sort=name&limit=10")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_pages(self):
+        """It should Get all Inventory items one page at a time"""
+        items = InventoryFactory.create_batch(5)
+        for i in items:
+            i.create()
+
+        response = self.client.get(BASE_URL, query_string="limit=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        pids = [item["pid"] for item in response.get_json()]
+        self.assertEqual(len(pids), 2)
+
+        while next_link(response):
+            response = self.client.get(next_link(response))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pids.extend(item["pid"] for item in response.get_json())
+
+        self.assertEqual(pids, sorted(item.pid for item in items))
+
+    def test_query_pages_with_filter(self):
+        """It should keep the filters when following the next link"""
+        items = InventoryFactory.create_batch(6)
+        for i in items:
+            i.active = True
+            i.create()
+
+        response = self.client.get(BASE_URL, query_string="active=true&limit=5")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("active=true", next_link(response))
+        response = self.client.get(next_link(response))
+        self.assertEqual(len(response.get_json()), 1)
+        self.assertIsNone(next_link(response))
+
+    def test_query_pages_bad_limit(self):
+        """It should not Get a page with a bad limit"""
+        response = self.client.get(BASE_URL, query_string="limit=0")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(BASE_URL, query_string="limit=Test")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_pages_bad_cursor(self):
+        """It should not Get a page with a bad cursor"""
+        response = self.client.get(BASE_URL, query_string="cursor=Test")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # ----------------------------------------------------------
+    # TEST SUMMARY
+    # ----------------------------------------------------------
+
+    def test_summary(self):
+        """It should Get the totals per condition and active flag"""
+        InventoryFactory(pid=1, condition=Condition.NEW, quantity=5, active=True).create()
+        InventoryFactory(pid=2, condition=Condition.NEW, quantity=7, active=False).create()
+        InventoryFactory(pid=3, condition=Condition.USED, quantity=1, active=True).create()
+
+        response = self.client.get(f"{BASE_URL}/summary")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertEqual(data["items"], 3)
+        self.assertEqual(data["quantity"], 13)
+        self.assertEqual(
+            data["conditions"],
+            [
+                {"condition": 0, "items": 2, "quantity": 12},
+                {"condition": 1, "items": 1, "quantity": 1},
+                {"condition": 2, "items": 0, "quantity": 0},
+            ],
+        )
+        self.assertEqual(
+            data["active"],
+            [
+                {"active": True, "items": 2, "quantity": 6},
+                {"active": False, "items": 1, "quantity": 7},
+            ],
+        )
+        self.assertEqual(len(data["groups"]), 3)
+
+    def test_summary_is_cached(self):
+        """It should reuse the summary until it expires"""
+        InventoryFactory(quantity=5).create()
+        self.assertEqual(self.client.get(f"{BASE_URL}/summary").get_json()["items"], 1)
+        InventoryFactory(quantity=5).create()
+        self.assertEqual(self.client.get(f"{BASE_URL}/summary").get_json()["items"], 1)
+        Inventory.summary_cache.clear()
+        self.assertEqual(self.client.get(f"{BASE_URL}/summary").get_json()["items"], 2)
+
+    # ----------------------------------------------------------
+    # TEST LOW STOCK
+    # ----------------------------------------------------------
+
+    def test_low_stock(self):
+        """It should Get the active items below their restock level, largest deficit first"""
+        InventoryFactory(pid=1, quantity=5, restock_level=10, active=True).create()
+        InventoryFactory(pid=2, quantity=1, restock_level=10, active=True).create()
+        InventoryFactory(pid=3, quantity=10, restock_level=10, active=True).create()
+        InventoryFactory(pid=4, quantity=0, restock_level=10, active=False).create()
+
+        response = self.client.get(f"{BASE_URL}/low-stock")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertEqual([item["pid"] for item in data], [2, 1])
+        self.assertEqual([item["deficit"] for item in data], [9, 5])
+
+    def test_low_stock_pages(self):
+        """It should Get the low stock report one page at a time"""
+        for pid in range(5):
+            InventoryFactory(pid=pid, quantity=pid % 2, restock_level=10, active=True).create()
+
+        response = self.client.get(f"{BASE_URL}/low-stock", query_string="limit=2")
+        pids = [item["pid"] for item in response.get_json()]
+        while next_link(response):
+            response = self.client.get(next_link(response))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pids.extend(item["pid"] for item in response.get_json())
+        self.assertEqual(pids, [0, 2, 4, 1, 3])
+
+    def test_low_stock_bad_cursor(self):
+        """It should not Get the low stock report with a bad cursor"""
+        response = self.client.get(f"{BASE_URL}/low-stock", query_string="cursor=Test")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # ----------------------------------------------------------
+    # TEST ADJUST
+    # ----------------------------------------------------------
+
+    def test_adjust_quantity(self):
+        """It should Adjust the quantity of an Inventory item"""
+        test_item = InventoryFactory(quantity=10)
+        test_item.create()
+        version = test_item.version
+        url = f"{BASE_URL}/{test_item.pid}/{test_item.condition.value}/adjust"
+
+        response = self.client.post(url, json={"delta": -3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertEqual(data["quantity"], 7)
+        self.assertEqual(data["version"], version + 1)
+        self.assertIsNotNone(response.headers.get("ETag"))
+
+        response = self.client.post(url, json={"delta": 5})
+        self.assertEqual(response.get_json()["quantity"], 12)
+
+    def test_adjust_quantity_below_zero(self):
+        """It should not Adjust the quantity of an Inventory item below zero"""
+        test_item = InventoryFactory(quantity=2)
+        test_item.create()
+        url = f"{BASE_URL}/{test_item.pid}/{test_item.condition.value}/adjust"
+
+        response = self.client.post(url, json={"delta": -3})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        response = self.client.post(url, json={"delta": -2})
+        self.assertEqual(response.get_json()["quantity"], 0)
+
+    def test_adjust_quantity_not_found(self):
+        """It should not Adjust the quantity of an item that does not exist"""
+        test_item = InventoryFactory()
+        url = f"{BASE_URL}/{test_item.pid}/{test_item.condition.value}/adjust"
+        response = self.client.post(url, json={"delta": 1})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_adjust_quantity_bad_delta(self):
+        """It should not Adjust the quantity with a bad delta"""
+        test_item = InventoryFactory()
+        test_item.create()
+        url = f"{BASE_URL}/{test_item.pid}/{test_item.condition.value}/adjust"
+        response = self.client.post(url, json={"delta": "Test"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, json={})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_adjust_quantity_out_of_range(self):
+        """It should not Adjust the quantity beyond the range of the column"""
+        test_item = InventoryFactory(quantity=10)
+        test_item.create()
+        url = f"{BASE_URL}/{test_item.pid}/{test_item.condition.value}/adjust"
+        for delta in (2**70, -(2**70), 2**31):
+            response = self.client.post(url, json={"delta": delta})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, delta)
+        response = self.client.post(url, json={"delta": 2**31 - 10})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, json={"delta": 2**31 - 11})
+        self.assertEqual(response.get_json()["quantity"], 2**31 - 1)
+
     # ----------------------------------------------------------
     # TEST ACTION
     # ----------------------------------------------------------
@@ -405,3 +1031,76 @@ class TestInventoryServer(TestCase):
         response = self.client.put(
             f"{BASE_URL}/deactivate/{test_item.pid}/{test_item.condition.value}")
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_activate_keys(self):
+        """It should Activate a list of Inventory items in one request"""
+        items = [InventoryFactory(active=False) for _ in range(3)]
+        items.append(InventoryFactory(active=True))
+        Inventory.bulk_insert([item.as_row() for item in items])
+        versions = [Inventory.find_version(item.pid, item.condition.value) for item in items]
+        # a cached item must not be served with its old flag
+        self.client.get(f"{BASE_URL}/{items[0].pid}", query_string=f"condition={items[0].condition.value}")
+        keys = [{"pid": item.pid, "condition": item.condition.value} for item in items]
+        keys.append({"pid": 999999, "condition": 0})
+        response = self.client.put(f"{BASE_URL}/activate", json=keys)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json(), {"updated": 3})
+        for item, version in zip(items, versions):
+            response = self.client.get(
+                f"{BASE_URL}/{item.pid}", query_string=f"condition={item.condition.value}"
+            )
+            data = response.get_json()
+            self.assertTrue(data["active"])
+            # only the items that changed get a new version
+            self.assertEqual(data["version"], version if item is items[-1] else version + 1)
+
+    def test_deactivate_filter(self):
+        """It should Deactivate every Inventory item matching the filters"""
+        for condition in Condition:
+            InventoryFactory(pid=1, condition=condition, active=True).create()
+        InventoryFactory(pid=2, condition=Condition.NEW, active=True).create()
+        response = self.client.put(f"{BASE_URL}/deactivate", query_string="pid=1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json(), {"updated": 3})
+        response = self.client.get(BASE_URL, query_string="active=true")
+        self.assertEqual([item["pid"] for item in response.get_json()], [2])
+
+    def test_activate_many_keys(self):
+        """It should Activate more keys than fit in one statement"""
+        rows = [
+            {"pid": pid, "condition": Condition.USED, "name": "item", "quantity": 1,
+             "restock_level": 1, "active": False}
+            for pid in range(1200)
+        ]
+        Inventory.bulk_insert(rows)
+        keys = [{"pid": pid, "condition": Condition.USED.value} for pid in range(1200)]
+        response = self.client.put(f"{BASE_URL}/activate", json=keys)
+        self.assertEqual(response.get_json(), {"updated": 1200})
+
+    def test_activate_bad_requests(self):
+        """It should not Activate items without valid keys or filters"""
+        response = self.client.put(f"{BASE_URL}/activate")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.put(f"{BASE_URL}/activate", json=[{"pid": 1, "condition": 0}],
+                                   query_string="pid=1")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.put(f"{BASE_URL}/deactivate", json={"pid": 1, "condition": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.put(f"{BASE_URL}/deactivate", json=[{"pid": 1, "condition": 9}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Key 0 is invalid", response.get_json()["message"])
+        response = self.client.put(f"{BASE_URL}/activate", data="[]", content_type="text/plain")
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        with patch("service.routes.MAX_BATCH_SIZE", 1):
+            response = self.client.put(
+                f"{BASE_URL}/activate", json=[{"pid": 1, "condition": 0}] * 2
+            )
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_activate_bad_filters(self):
+        """It should not Activate items with an invalid or misspelled filter"""
+        InventoryFactory(active=False).create()
+        for query_string in ("active=maybe", "nmae=Test&min_quantity=0", "min_quantity=Test"):
+            response = self.client.put(f"{BASE_URL}/activate", query_string=query_string)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query_string)
+        self.assertFalse(Inventory.all()[0].active)
@@ -0,0 +1,35 @@
+"""
+Serializers Test Suite
+"""
+import json
+from unittest import TestCase
+from unittest.mock import patch
+from service.models import Condition
+from service.common import serializers
+
+ROW = (1, Condition.USED, "item", 5, 2, True, 3)
+ITEM = {
+    "pid": 1,
+    "condition": 1,
+    "name": "item",
+    "quantity": 5,
+    "restock_level": 2,
+    "active": True,
+    "version": 3,
+}
+
+
+class TestSerializers(TestCase):
+    """Test Cases for the row serializers"""
+
+    def test_dumps_rows(self):
+        """It should encode rows as a list of serialized items"""
+        self.assertEqual(json.loads(serializers.dumps_rows([ROW])), [ITEM])
+
+    def test_dumps_rows_without_orjson(self):
+        """It should encode rows with the json module when orjson is missing"""
+        with patch.object(serializers, "orjson", None):
+            data = serializers.dumps_rows([ROW])
+            self.assertIsInstance(data, bytes)
+            self.assertEqual(json.loads(data), [ITEM])
+            self.assertRaises(TypeError, serializers.dumps, [object()])
@@ -0,0 +1,52 @@
+"""
+Validation Test Suite
+"""
+from unittest import TestCase
+from service.models import VALIDATOR, Condition, DataValidationError
+
+ITEM = {
+    "pid": 1,
+    "condition": 2,
+    "name": "item",
+    "quantity": 5,
+    "restock_level": 2,
+    "active": True,
+}
+
+
+class TestValidator(TestCase):
+    """Test Cases for the Inventory Validator"""
+
+    def test_validate(self):
+        """It should return the values of a valid item"""
+        values = VALIDATOR.validate(ITEM)
+        self.assertEqual(values, dict(ITEM, condition=Condition.OPEN_BOX))
+
+    def test_validate_messages(self):
+        """It should report the first problem of an item like deserialize always has"""
+        cases = [
+            ({**ITEM, "pid": "1"}, "Invalid type for int [pid]: <class 'str'>"),
+            ({**ITEM, "condition": 7}, "Invalid condition: <class 'int'>"),
+            ({**ITEM, "name": 3, "active": None}, "Invalid type for str [name]: <class 'int'>"),
+            ({**ITEM, "active": 1}, "Invalid type for bool [active]: <class 'int'>"),
+            ({"pid": 1}, "Invalid item: missing condition"),
+            (
+                {**ITEM, "condition": []},
+                "Invalid item: body of request contained bad or no data unhashable type: 'list'",
+            ),
+        ]
+        for data, message in cases:
+            with self.assertRaises(DataValidationError) as context:
+                VALIDATOR.validate(data)
+            self.assertEqual(str(context.exception), message)
+        self.assertRaises(DataValidationError, VALIDATOR.validate, None)
+        self.assertRaises(DataValidationError, VALIDATOR.validate, [1, 2])
+
+    def test_validate_many(self):
+        """It should return every valid item and every error with its position"""
+        items = [ITEM, {**ITEM, "pid": None}, "item", {**ITEM, "pid": 2}]
+        valid, errors = VALIDATOR.validate_many(items)
+        self.assertEqual([index for index, _ in valid], [0, 3])
+        self.assertEqual(valid[1][1]["pid"], 2)
+        self.assertEqual([index for index, _ in errors], [1, 2])
+        self.assertEqual(errors[0][1], "Invalid type for int [pid]: <class 'NoneType'>")